@@ -0,0 +1,191 @@
+import json
+import mmap
+import os
+import struct
+import threading
+
+from task import PRIORITIES, PRIORITY_CODES, Task
+
+ARCHIVE_MAGIC = b"TASKARCH"
+ARCHIVE_VERSION = 1
+
+# magic, version, record size, count, max id, start of the last batch
+HEADER = struct.Struct("<8sIIqqq")
+HEADER_SIZE = 64
+
+# id, created, text offset, text length, due, priority code
+RECORD = struct.Struct("<qqqIib3x")
+
+# Stands in for a missing date or a priority without a code
+NO_DATE = -(1 << 31)
+NO_TIME = -(1 << 63)
+NO_CODE = -1
+
+class TaskArchive:
+    """Read-only store of archived (completed) tasks, memory-mapped
+    
+    `<path>` holds a header followed by fixed-width records, so the record of
+    the n-th archived task is at a computed offset and can be read without
+    touching any other. The numeric fields live in the record; the
+    description, completion time and extra keys are a small JSON array in
+    `<path>.text`, located by the offset and length in the record. Both files
+    are memory-mapped and tasks are decoded only when asked for, so an
+    archive of any size costs no memory until its rows are viewed.
+    
+    Tasks are only ever appended, in batches. A batch is written after the
+    end of the committed records and becomes part of the archive when the
+    header's count is rewritten, so a crash leaves either the whole batch or
+    none of it. The header also keeps where the last batch starts;
+    `last_batch_ids` lets the journal backend drop those tasks from its
+    snapshot even if the journal record of the batch was lost.
+    
+    Appending happens on the storage worker thread while the UI thread reads;
+    the maps are swapped under a lock. Other instances of the app may append
+    too (with the journal's file lock held); `reload` picks up their batches.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.text_path = path + ".text"
+        self.count = 0
+        self.max_id = 0
+        self.batch_start = 0
+        self._records = None
+        self._text = None
+        self._lock = threading.Lock()
+        self.reload()
+    
+    def __len__(self):
+        return self.count
+    
+    def __getitem__(self, index):
+        with self._lock:
+            if index < 0:
+                index += self.count
+            if not 0 <= index < self.count:
+                raise IndexError("archive index out of range")
+            task_id, created, offset, length, due, code = RECORD.unpack_from(
+                self._records, HEADER_SIZE + index * RECORD.size)
+            text = self._text[offset:offset + length]
+        description, completed_at, extra, priority = json.loads(text)
+        return Task(
+            task_id,
+            description,
+            PRIORITIES[code] if code != NO_CODE else priority,
+            due if due != NO_DATE else None,
+            created if created != NO_TIME else None,
+            True,
+            completed_at,
+            extra
+        )
+    
+    def last_batch_ids(self):
+        """Return the ids of the tasks archived by the last batch"""
+        with self._lock:
+            return [RECORD.unpack_from(self._records, HEADER_SIZE + index * RECORD.size)[0]
+                    for index in range(self.batch_start, self.count)]
+    
+    def append(self, tasks):
+        """Archive a batch of tasks"""
+        # Another instance may have appended since the files were mapped
+        self.reload()
+        records = []
+        with open(self.text_path, 'ab') as f:
+            offset = f.tell()
+            for task in tasks:
+                priority = task.priority
+                code = PRIORITY_CODES.get(priority, NO_CODE)
+                text = json.dumps([task.description, task.completed_at, task.extra,
+                                   priority if code == NO_CODE else None], separators=(",", ":")).encode()
+                due = task.due
+                created = task.created
+                records.append(RECORD.pack(
+                    task.id,
+                    created if created is not None else NO_TIME,
+                    offset,
+                    len(text),
+                    due if due is not None else NO_DATE,
+                    code
+                ))
+                f.write(text)
+                offset += len(text)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        count = self.count + len(records)
+        max_id = max([self.max_id] + [task.id for task in tasks if isinstance(task.id, int)])
+        mode = 'r+b' if os.path.exists(self.path) else 'w+b'
+        with open(self.path, mode) as f:
+            # Records past the committed count are leftovers of a failed
+            # append and are overwritten
+            f.seek(HEADER_SIZE + self.count * RECORD.size)
+            f.write(b"".join(records))
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            f.write(self._header(count, max_id, self.count))
+            f.flush()
+            os.fsync(f.fileno())
+        self.reload()
+    
+    def close(self):
+        """Release the memory maps"""
+        with self._lock:
+            for view in (self._records, self._text):
+                if view is not None:
+                    view.close()
+            self._records = self._text = None
+            self.count = 0
+    
+    def _header(self, count, max_id, batch_start):
+        header = HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, RECORD.size, count, max_id, batch_start)
+        return header.ljust(HEADER_SIZE, b"\0")
+    
+    def reload(self):
+        """Map the files again, picking up the committed header"""
+        records = map_file(self.path)
+        text = map_file(self.text_path)
+        if records is not None and len(records) >= HEADER_SIZE and records[:8] != bytes(8):
+            magic, version, size, count, max_id, batch_start = HEADER.unpack_from(records)
+            if magic != ARCHIVE_MAGIC or size != RECORD.size:
+                records.close()
+                raise ValueError(f"{self.path} is not a task archive")
+            if version > ARCHIVE_VERSION:
+                records.close()
+                raise ValueError("Task archive written by a newer version of the app")
+        else:
+            # Missing, or created by an append that never committed
+            count = max_id = batch_start = 0
+        with self._lock:
+            old = (self._records, self._text)
+            self._records, self._text = records, text
+            self.count, self.max_id, self.batch_start = count, max_id, batch_start
+        for view in old:
+            if view is not None:
+                view.close()
+
+class WithArchive:
+    """The working set followed by the archived tasks, as one sequence
+    
+    Used as the source of the virtual task list: archived rows are read from
+    the archive only when they are scrolled into view.
+    """
+    
+    def __init__(self, tasks, archive):
+        self.tasks = tasks
+        self.archive = archive
+    
+    def __len__(self):
+        return len(self.tasks) + len(self.archive)
+    
+    def __getitem__(self, index):
+        if index < len(self.tasks):
+            return self.tasks[index]
+        return self.archive[index - len(self.tasks)]
+
+def map_file(path):
+    """Map a file read-only, or return None when it is missing or empty"""
+    if not os.path.exists(path) or os.path.getsize(path) < 1:
+        return None
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
\ No newline at end of file
@@ -0,0 +1,416 @@
+"""Headless benchmarks for the ProductivityApp hot paths
+
+Generates synthetic task files, drives the app against a real Tk (on the
+current display, or under Xvfb when one is installed) or a stubbed Tk, and
+prints per-operation latency percentiles, peak memory and file sizes as JSON.
+
+    python benchmark.py --sizes 1000,10000,100000 --output bench.json
+    python benchmark.py --sizes 1000000 --stub --backend sqlite
+
+Every size runs in a separate process so peak memory is measured per size.
+"""
+import argparse
+from datetime import date, datetime, timedelta
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+import config
+import convert
+from storage import COMPRESSIONS, FORMATS
+
+def generate_tasks(path, count, seed=0, priorities="high=1,medium=2,low=1", completed=0.3,
+                   due_range=(-30, 60), no_due=0.2, created_range=(-365, 0)):
+    """Write a snapshot file with `count` synthetic tasks"""
+    rng = random.Random(seed)
+    names, weights = zip(*((name, float(weight)) for name, weight in
+                           (item.split("=") for item in priorities.split(","))))
+    today = date.today()
+    now = datetime.now().replace(microsecond=0)
+    with open(path, 'w') as f:
+        f.write('{"version": 1, "seq": 0, "tasks": [\n')
+        for task_id in range(1, count + 1):
+            task = {
+                "id": task_id,
+                "description": f"Synthetic task {task_id}",
+                "priority": rng.choices(names, weights)[0],
+                "due_date": "" if rng.random() < no_due else
+                            (today + timedelta(days=rng.randint(*due_range))).isoformat(),
+                "created_at": (now + timedelta(days=rng.randint(*created_range),
+                                               seconds=-rng.randint(0, 86399))).strftime("%Y-%m-%d %H:%M:%S"),
+                "completed": rng.random() < completed
+            }
+            if task["completed"]:
+                task["completed_at"] = task["created_at"]
+            f.write(json.dumps(task))
+            f.write(",\n" if task_id < count else "\n")
+        f.write("]}")
+
+def percentiles(samples):
+    """Summarize latencies in seconds as millisecond percentiles"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+    return {"count": len(ordered), "p50_ms": pick(0.5), "p90_ms": pick(0.9),
+            "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in KiB, if known"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def install_stub_tk():
+    """Replace tkinter with an in-process stub before the app is imported
+    
+    Widgets accept and ignore any call; the Treeview keeps its items so the
+    view models do the same work as against real Tk, minus the drawing.
+    """
+    counter = itertools.count(1)
+    
+    class Widget:
+        def __init__(self, master=None, **kw):
+            self.master = master
+            self.kw = kw
+        
+        def __getattr__(self, name):
+            return lambda *args, **kw: None
+        
+        def config(self, **kw):
+            self.kw.update(kw)
+        
+        configure = config
+        
+        def cget(self, name):
+            return self.kw.get(name)
+    
+    class Tk(Widget):
+        def __init__(self):
+            super().__init__()
+            self.pending = {}
+            self.idle = {}
+        
+        def after(self, ms, func=None, *args):
+            after_id = f"after#{next(counter)}"
+            self.pending[after_id] = (time.perf_counter() + ms / 1000, func, args)
+            return after_id
+        
+        def after_idle(self, func, *args):
+            after_id = f"idle#{next(counter)}"
+            self.idle[after_id] = (func, args)
+            return after_id
+        
+        def after_cancel(self, after_id):
+            self.pending.pop(after_id, None)
+            self.idle.pop(after_id, None)
+        
+        def update(self):
+            now = time.perf_counter()
+            for after_id, (due, func, args) in sorted(self.pending.items(), key=lambda item: item[1][0]):
+                if due <= now and self.pending.pop(after_id, None):
+                    func(*args)
+            self.update_idletasks()
+        
+        def update_idletasks(self):
+            while self.idle:
+                func, args = self.idle.pop(next(iter(self.idle)))
+                func(*args)
+    
+    class Variable:
+        def __init__(self, master=None, value=""):
+            self.value = value
+        
+        def get(self):
+            return self.value
+        
+        def set(self, value):
+            self.value = value
+        
+        def trace_add(self, mode, callback):
+            pass
+    
+    class Entry(Widget):
+        text = ""
+        
+        def get(self):
+            return self.text
+        
+        def insert(self, index, text):
+            self.text = self.text + text if index == "end" else text + self.text
+        
+        def delete(self, first, last=None):
+            self.text = ""
+    
+    class Treeview(Widget):
+        def __init__(self, master=None, **kw):
+            super().__init__(master, **kw)
+            self.children = []
+            self.values = {}
+            self.selected = []
+            self.focused = ""
+        
+        def insert(self, parent, index, values=()):
+            item = f"I{next(counter):06X}"
+            self.values[item] = values
+            if index == "end":
+                self.children.append(item)
+            else:
+                self.children.insert(index, item)
+            return item
+        
+        def delete(self, *items):
+            gone = set(items)
+            self.children = [item for item in self.children if item not in gone]
+            for item in items:
+                self.values.pop(item, None)
+        
+        def item(self, item, values=None):
+            if values is not None:
+                self.values[item] = values
+            return {"values": self.values[item]}
+        
+        def detach(self, *items):
+            gone = set(items)
+            self.children = [item for item in self.children if item not in gone]
+        
+        def move(self, item, parent, index):
+            self.children.insert(index, item)
+        
+        def get_children(self, item=""):
+            return tuple(self.children)
+        
+        def selection(self):
+            return tuple(self.selected)
+        
+        def selection_set(self, items):
+            self.selected = list(items)
+        
+        def focus(self, item=None):
+            if item is None:
+                return self.focused
+            self.focused = item
+        
+        def bbox(self, item, column=None):
+            return (0, 20, 100, 20) if item in self.values else ""
+    
+    tk = types.ModuleType("tkinter")
+    ttk = types.ModuleType("tkinter.ttk")
+    font = types.ModuleType("tkinter.font")
+    messagebox = types.ModuleType("tkinter.messagebox")
+    filedialog = types.ModuleType("tkinter.filedialog")
+    tk.Tk = Tk
+    tk.Toplevel = tk.Menu = Widget
+    tk.StringVar = tk.DoubleVar = tk.BooleanVar = Variable
+    tk.END = "end"
+    for name in ("Frame", "LabelFrame", "Label", "Button", "Radiobutton", "Scale", "Scrollbar", "Combobox"):
+        setattr(ttk, name, Widget)
+    ttk.Entry = Entry
+    ttk.Treeview = Treeview
+    font.Font = Widget
+    for name in ("showerror", "showwarning", "showinfo"):
+        setattr(messagebox, name, lambda *args, **kw: None)
+    filedialog.asksaveasfilename = filedialog.askopenfilename = lambda *args, **kw: ""
+    tk.ttk, tk.font, tk.messagebox, tk.filedialog = ttk, font, messagebox, filedialog
+    sys.modules.update({"tkinter": tk, "tkinter.ttk": ttk, "tkinter.font": font,
+                        "tkinter.messagebox": messagebox, "tkinter.filedialog": filedialog})
+
+def start_display():
+    """Make sure Tk has a display, starting Xvfb if needed; return (mode, process)"""
+    if os.environ.get("DISPLAY"):
+        return "display", None
+    if not shutil.which("Xvfb"):
+        return None, None
+    display = ":%d" % (90 + os.getpid() % 100)
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    os.environ["DISPLAY"] = display
+    return "xvfb", process
+
+def run_size(args, count):
+    """Benchmark one file size in the current process and return the results"""
+    if args.stub:
+        install_stub_tk()
+    import tkinter as tk
+    import study3deep2
+    
+    # Dialogs would block the run
+    for name in ("showerror", "showwarning", "showinfo"):
+        setattr(study3deep2.messagebox, name, lambda *a, **kw: None)
+    
+    workdir = tempfile.mkdtemp(prefix="taskbench-")
+    os.chdir(workdir)
+    settings = dict(config.DEFAULTS, backend=args.backend, format=args.format, compression=args.compression)
+    started = time.perf_counter()
+    generate_tasks(settings["data_file"], count, args.seed, args.priorities, args.completed,
+                   tuple(map(int, args.due_range.split(":"))), args.no_due,
+                   tuple(map(int, args.created_range.split(":"))))
+    if (args.format, args.compression) != ("json", "none"):
+        convert.convert(settings["data_file"], settings["data_file"], args.format, args.compression)
+    result = {"tasks": count, "generate_s": round(time.perf_counter() - started, 3), "operations": {}}
+    result["files"] = {"generated": file_sizes(workdir)}
+    
+    # Load: time to the first rows and to the end of the background load
+    started = time.perf_counter()
+    root = tk.Tk()
+    app = study3deep2.ProductivityApp(root, settings)
+    first_paint = None
+    while app.loading and app.load_error is None:
+        root.update()
+        if first_paint is None and len(app.tasks):
+            first_paint = time.perf_counter() - started
+        time.sleep(0.001)
+    result["load"] = {"first_paint_ms": round((first_paint or 0) * 1000, 3),
+                      "total_ms": round((time.perf_counter() - started) * 1000, 3)}
+    
+    rng = random.Random(args.seed)
+    samples = {}
+    
+    def timed(name, func, *func_args):
+        started = time.perf_counter()
+        func(*func_args)
+        root.update_idletasks()
+        samples.setdefault(name, []).append(time.perf_counter() - started)
+    
+    def search(text):
+        app.search_var.set(text)
+        app.update_task_list()
+    
+    def wait_saved():
+        while app.storage.saving():
+            time.sleep(0.0005)
+    
+    def save(op):
+        # Until the worker has written it, not just until it is queued
+        app.engine.save(op)
+        wait_saved()
+    
+    def select_pending():
+        pending = [task.id for task in itertools.islice(app.tasks.smart_tasks(), 200)]
+        app.task_view.selected = {rng.choice(pending): None} if pending else {}
+    
+    for i in range(args.samples):
+        app.desc_entry.delete(0, tk.END)
+        app.desc_entry.insert(0, f"Benchmark task {i}")
+        timed("add_task", app.add_task)
+        select_pending()
+        timed("complete_task", app.complete_task)
+        select_pending()
+        timed("delete_task", app.delete_task)
+        # The edits above are written first, so only this record is timed
+        wait_saved()
+        timed("save_tasks", save, {"op": "update", "id": app.tasks[0].id,
+                                   "fields": {"description": app.tasks[0].description}})
+        timed("update_task_list", app.update_task_list)
+        timed("scroll", app.task_view.scroll, rng.randint(-500, 500))
+        timed("search", search, str(rng.randint(1, count)))
+        search("")
+        timed("update_smart_view", app.update_smart_view)
+        timed("update_stats", app.update_stats)
+        root.update()
+    
+    # A day change re-scores every pending task
+    for i in range(min(args.samples, 5)):
+        timed("smart_rollover", app.tasks.set_today, app.today + 1 + i)
+    app.update_smart_view()
+    
+    timed("clear_completed", app.clear_completed)
+    
+    # Close waits for the background writer
+    started = time.perf_counter()
+    app.on_close()
+    samples["close"] = [time.perf_counter() - started]
+    
+    result["operations"] = {name: percentiles(values) for name, values in samples.items()}
+    result["files"]["after_run"] = file_sizes(workdir)
+    result["peak_rss_kb"] = peak_rss_kb()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+def file_sizes(directory):
+    """Return the size of every file in a directory"""
+    return {name: os.path.getsize(os.path.join(directory, name)) for name in sorted(os.listdir(directory))}
+
+def git_revision():
+    """Return the commit being benchmarked, if this is a git checkout"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated task counts")
+    parser.add_argument("--samples", type=int, default=50, help="repetitions of each operation")
+    parser.add_argument("--backend", choices=("journal", "sqlite"), default="journal")
+    parser.add_argument("--format", choices=FORMATS, default="json", help="task file format (journal backend)")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none", help="task file compression")
+    parser.add_argument("--stub", action="store_true", help="use a stubbed Tk instead of a display")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--priorities", default="high=1,medium=2,low=1", help="priority weights")
+    parser.add_argument("--completed", type=float, default=0.3, help="fraction of completed tasks")
+    parser.add_argument("--due-range", default="-30:60", help="due dates, in days from today")
+    parser.add_argument("--no-due", type=float, default=0.2, help="fraction of tasks without a due date")
+    parser.add_argument("--created-range", default="-365:0", help="creation dates, in days from today")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker is not None:
+        print(json.dumps(run_size(args, args.worker)))
+        return
+    
+    display, xvfb = (None, None) if args.stub else start_display()
+    if display is None and not args.stub:
+        print("No display and no Xvfb found, using the stubbed Tk", file=sys.stderr)
+        args.stub = True
+    
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tk": "stub" if args.stub else display,
+        "backend": args.backend,
+        "format": args.format,
+        "compression": args.compression,
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "results": []
+    }
+    script = os.path.abspath(__file__)
+    # Workers get the same options, with the stub decided above
+    worker_args = [arg for arg in sys.argv[1:] if arg != "--stub"] + (["--stub"] if args.stub else [])
+    try:
+        for count in (int(size) for size in args.sizes.split(",")):
+            print(f"Benchmarking {count} tasks...", file=sys.stderr)
+            output = subprocess.check_output([sys.executable, script, *worker_args, "--worker", str(count)],
+                                             cwd=os.path.dirname(script), text=True)
+            report["results"].append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
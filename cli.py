@@ -0,0 +1,207 @@
+"""Command line access to the task file, without the window
+
+    python cli.py add "Write the report" --priority high --due 2024-05-01
+    python cli.py complete 12 15
+    python cli.py list --smart --limit 20
+    python cli.py list --offset 100 --limit 50
+    python cli.py stats
+    python cli.py import tasks.csv
+
+Takes the same settings as the app (config.json and the storage options)
+and never imports tkinter, so it runs on machines without a display, e.g.
+from cron. Tasks are streamed from the file instead of being loaded into
+memory, so files of any size work; commands that only write read the
+snapshot's header and the journal. It may run while the app is open:
+records are appended under the task file's lock and the app merges them
+like the changes of another instance. Once enough records have piled up
+the journal is compacted, streaming the tasks into the new snapshot.
+"""
+import argparse
+import itertools
+import sys
+
+import config
+from engine import batch_record, number_tasks, smart_stats_text, smart_top, stats_text, stream_tasks, tally
+from importer import ImportSource
+from task import PRIORITIES, Task, format_day, now_text, now_timestamp, parse_day, set_timezone, today
+from taskstore import TaskStats
+
+# Imported tasks written per record
+IMPORT_CHUNK = 5000
+
+def prepare(storage):
+    """Read as much of the task file as the backend needs to know the ids in use"""
+    migrate = getattr(storage, "migrate", None)
+    if migrate is not None:
+        # The database tracks its ids itself
+        count = migrate()
+        if count is not None:
+            print(f"Migrated {count} tasks from {storage.migrate_from} to {storage.path}")
+        return
+    if storage.read_tail():
+        return
+    # Older snapshots do not record the next unused id
+    for data in storage.iter_load():
+        pass
+
+def compact(storage):
+    """Compact the journal once it holds enough records"""
+    compact_file = getattr(storage, "compact_file", None)
+    if compact_file is not None and storage.pending_ops >= storage.compact_every:
+        compact_file()
+
+def format_task(task):
+    """Return the line printed for a task"""
+    due = task.due_date if task.due is not None else "-"
+    done = "x" if task.completed else " "
+    return f"{task.id:>7}  [{done}]  {task.priority:<6}  {due:<10}  {task.description}"
+
+def add(storage, args):
+    due = None
+    if args.due:
+        try:
+            due = parse_day(args.due)
+        except ValueError:
+            print("Error: Invalid date format. Use YYYY-MM-DD")
+            return 1
+    prepare(storage)
+    task = Task(storage.reserve_ids(1), args.description, args.priority, due, now_timestamp())
+    storage.append([{"op": "add", "task": task.to_dict()}])
+    compact(storage)
+    print(f"Added task {task.id}")
+    return 0
+
+def complete(storage, args):
+    wanted = set(args.ids)
+    pending = []
+    for task in stream_tasks(storage):
+        if task.id in wanted:
+            wanted.discard(task.id)
+            if not task.completed:
+                pending.append(task.id)
+    completed_at = now_text()
+    if pending:
+        storage.append([batch_record([{"op": "complete", "id": task_id, "completed_at": completed_at}
+                                      for task_id in pending])])
+        compact(storage)
+    print(f"Completed {len(pending)} tasks")
+    for task_id in sorted(wanted):
+        print(f"Error: no task with id {task_id}")
+    return 1 if wanted else 0
+
+def list_tasks(storage, args):
+    day = today()
+    end = args.offset + args.limit if args.limit is not None else None
+    smart_query = getattr(storage, "smart_tasks", None)
+    page = getattr(storage, "page", None)
+    if args.smart and smart_query is not None:
+        # The database scores and sorts the pending rows
+        prepare(storage)
+        tasks = map(Task.from_dict, smart_query(format_day(day), end if end is not None else -1)[args.offset:])
+    elif page is not None and not args.smart and not args.pending:
+        # Only the rows of the page are read from the database
+        prepare(storage)
+        tasks = map(Task.from_dict, page(args.offset, args.limit if args.limit is not None else -1))
+    else:
+        if args.smart:
+            tasks = smart_top(stream_tasks(storage), day, end)
+        else:
+            tasks = stream_tasks(storage)
+            if args.pending:
+                tasks = (task for task in tasks if not task.completed)
+        tasks = itertools.islice(tasks, args.offset, end)
+    for task in tasks:
+        print(format_task(task))
+    return 0
+
+def stats(storage, args):
+    day = today()
+    query = getattr(storage, "stats", None)
+    if query is not None:
+        # Counted by the database
+        prepare(storage)
+        counts = query(format_day(day))
+        totals = TaskStats(day)
+        totals.total, totals.completed, totals.overdue = counts["total"], counts["completed"], counts["overdue"]
+        if counts["due_today"]:
+            totals.due_counts[day] = counts["due_today"]
+    else:
+        totals = tally(stream_tasks(storage), day)
+    archive = getattr(storage, "archive", None)
+    print(stats_text(totals, len(archive) if archive is not None else 0))
+    print(smart_stats_text(totals))
+    return 0
+
+def import_file(storage, args):
+    source = ImportSource(args.file)
+    prepare(storage)
+    imported = 0
+    try:
+        tasks = (Task.from_dict(data) for data in source.iter_load())
+        while True:
+            # Each chunk is one record: written entirely or not at all
+            chunk = list(itertools.islice(tasks, IMPORT_CHUNK))
+            if not chunk:
+                break
+            number_tasks(chunk, storage.reserve_ids(len(chunk)))
+            storage.append([batch_record([{"op": "add", "task": task.to_dict()} for task in chunk])])
+            imported += len(chunk)
+    except (OSError, ValueError) as e:
+        print(f"Error importing {args.file}: {e}")
+        print(f"Imported {imported} tasks before the error")
+        return 1
+    finally:
+        compact(storage)
+    message = f"Imported {imported} tasks"
+    if source.skipped:
+        message += f", skipped {source.skipped} rows without a description"
+    print(message)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Work with the task file from the command line")
+    config.add_arguments(parser)
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    command = commands.add_parser("add", help="add a task")
+    command.add_argument("description")
+    command.add_argument("--priority", choices=PRIORITIES, default="medium")
+    command.add_argument("--due", help="due date, YYYY-MM-DD")
+    command.set_defaults(run=add)
+    
+    command = commands.add_parser("complete", help="mark tasks as completed")
+    command.add_argument("ids", type=int, nargs="+", metavar="id")
+    command.set_defaults(run=complete)
+    
+    command = commands.add_parser("list", help="print the tasks")
+    command.add_argument("--smart", action="store_true", help="pending tasks in smart view order")
+    command.add_argument("--pending", action="store_true", help="leave out completed tasks")
+    command.add_argument("--limit", type=int, help="print at most this many tasks")
+    command.add_argument("--offset", type=int, default=0, help="skip this many tasks first")
+    command.set_defaults(run=list_tasks)
+    
+    command = commands.add_parser("stats", help="print the statistics")
+    command.set_defaults(run=stats)
+    
+    command = commands.add_parser("import", help="import tasks from a CSV or NDJSON file")
+    command.add_argument("file")
+    command.set_defaults(run=import_file)
+    
+    args = parser.parse_args(argv)
+    settings = config.apply_arguments(config.load_config(), args)
+    try:
+        set_timezone(settings["timezone"])
+        storage = config.open_storage(settings)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    try:
+        return args.run(storage, args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        storage.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
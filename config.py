@@ -0,0 +1,64 @@
+import json
+import os
+
+from archive import TaskArchive
+from storage import COMPRESSIONS, FORMATS, JournalStorage
+
+CONFIG_FILE = "config.json"
+
+DEFAULTS = {
+    "backend": "journal",       # "journal" or "sqlite"
+    "data_file": "tasks.json",
+    "database": "tasks.db",
+    "format": "json",           # snapshot format written by the journal backend
+    "compression": "none",      # "none", "gzip" or "zstd" (needs zstandard)
+    "archive": "tasks.archive", # archived tasks of the journal backend, "" to disable
+    "timezone": ""              # IANA time zone for dates and times, "" for the system's
+}
+
+def load_config(path=CONFIG_FILE):
+    """Return the settings from `path`, falling back to the defaults"""
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                config.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error reading {path}: {e}")
+    return config
+
+def add_arguments(parser):
+    """Add the storage and time zone options to an argparse parser"""
+    parser.add_argument("--backend", choices=("journal", "sqlite"), help="task storage backend")
+    parser.add_argument("--data-file", help="JSON task file (journal backend, and source of the SQLite migration)")
+    parser.add_argument("--database", help="SQLite database file")
+    parser.add_argument("--format", choices=FORMATS, help="snapshot format to write (any format is read)")
+    parser.add_argument("--compression", choices=COMPRESSIONS, help="snapshot compression to write")
+    parser.add_argument("--archive",
+                        help="archive file for completed tasks (journal backend, migrated to SQLite; empty to disable)")
+    parser.add_argument("--timezone", help="time zone for dates and times, e.g. Europe/Berlin (default: the system's)")
+
+def apply_arguments(config, args):
+    """Override settings with the options given on the command line"""
+    for name in ("backend", "data_file", "database", "format", "compression", "archive", "timezone"):
+        value = getattr(args, name, None)
+        if value is not None:
+            config[name] = value
+    return config
+
+def open_storage(config):
+    """Create the storage backend selected in the settings"""
+    if config["backend"] == "sqlite":
+        # Imported here so the journal backend works without the sqlite3 module
+        from sqlstorage import SqliteStorage
+        return SqliteStorage(config["database"], migrate_from=config["data_file"],
+                             migrate_archive=TaskArchive(config["archive"]) if config["archive"] else None)
+    if config["backend"] != "journal":
+        raise ValueError(f"Unknown storage backend: {config['backend']}")
+    if config["format"] not in FORMATS:
+        raise ValueError(f"Unknown task file format: {config['format']}")
+    if config["compression"] not in COMPRESSIONS:
+        raise ValueError(f"Unknown task file compression: {config['compression']}")
+    archive = TaskArchive(config["archive"]) if config["archive"] else None
+    return JournalStorage(config["data_file"], format=config["format"], compression=config["compression"],
+                          archive=archive)
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""Convert a task file between the snapshot formats
+
+Run it while the app is closed, e.g. to switch an existing file to NDJSON:
+
+    python convert.py tasks.json tasks.json --format ndjson --compression gzip
+
+The app detects the format when loading, whatever its own settings are.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from archive import TaskArchive
+from storage import COMPRESSIONS, FORMATS, SNAPSHOT_VERSION, JournalStorage, write_atomic
+from task import Task
+
+def convert(source, target, format="ndjson", compression="none", archive=None):
+    """Rewrite a task file (and its journal) as a snapshot in another format
+    
+    Returns the number of tasks written. Converting a file in place keeps its
+    journal valid: the new snapshot records the journal's last sequence
+    number, so the records are not applied twice. Pass the path of the
+    file's archive, if it has one, so archived tasks are left out. The
+    next unused task id is carried over, so deleted ids stay retired.
+    """
+    storage = JournalStorage(source, archive=TaskArchive(archive) if archive else None)
+    try:
+        tasks = [Task.from_dict(data) for data in storage.iter_load()]
+    finally:
+        storage.close()
+    in_place = os.path.realpath(target) == os.path.realpath(source)
+    write_atomic(target, {"version": SNAPSHOT_VERSION, "seq": storage.seq if in_place else 0,
+                          "next_id": storage.max_id + 1, "tasks": tasks}, format, compression)
+    return len(tasks)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a task file between the json and ndjson formats")
+    parser.add_argument("source", help="task file to read (any format, its journal is applied)")
+    parser.add_argument("target", help="file to write; may be the source itself")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson", help="format to write (default: ndjson)")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none",
+                        help="compression to write (default: none)")
+    parser.add_argument("--archive", help="archive file of the task file, if it has one")
+    args = parser.parse_args(argv)
+    
+    # A file whose tasks were never compacted only has its journal
+    if not os.path.exists(args.source) and not os.path.exists(f"{args.source}.journal"):
+        print(f"Error: {args.source} does not exist")
+        return 1
+    started = time.perf_counter()
+    try:
+        count = convert(args.source, args.target, args.format, args.compression, args.archive)
+    except (OSError, ValueError) as e:
+        print(f"Error converting {args.source}: {e}")
+        return 1
+    print(f"Wrote {count} tasks to {args.target} ({os.path.getsize(args.target)} bytes) "
+          f"in {time.perf_counter() - started:.2f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
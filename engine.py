@@ -0,0 +1,179 @@
+import heapq
+
+from scoring import smart_points
+from task import Task, now_text, now_timestamp
+from taskstore import TaskStats, TaskStore
+
+# Task attributes whose JSON form has another name
+FILE_KEYS = {"due": "due_date", "created": "created_at"}
+
+class TaskEngine:
+    """The task logic of the app, without any UI
+    
+    Owns the in-memory TaskStore, hands out task ids and turns every change
+    into the record its storage backend writes. The app drives it from the
+    Tk event loop and adds the widgets; `on_save` is called after each
+    record is handed to the backend, so the app can show the save status.
+    Nothing here imports tkinter.
+    """
+    
+    # Ids reserved in the task file at a time
+    ID_BLOCK = 100
+    
+    def __init__(self, storage, today, on_save=None):
+        self.storage = storage
+        self.tasks = TaskStore([], today)
+        self.on_save = on_save
+        self.next_id = 1
+        self.id_limit = 1       # end of the block of ids reserved in the task file
+    
+    def loaded(self):
+        """Sort the loaded tasks and number new ones after them and the archived ones"""
+        self.tasks.sort_smart()
+        self.next_id = max((task.id for task in self.tasks), default=0) + 1
+        archive = getattr(self.storage, "archive", None)
+        if archive is not None:
+            self.next_id = max(self.next_id, archive.max_id + 1)
+        self.id_limit = self.next_id
+    
+    def allocate_ids(self, count=1):
+        """Return the first of `count` consecutive unused task ids
+        
+        Ids are reserved in the task file in blocks, so other instances
+        sharing it never hand out the same ones.
+        """
+        if self.next_id + count > self.id_limit:
+            block = max(count, self.ID_BLOCK)
+            try:
+                first = self.storage.reserve_ids(block)
+            except OSError as e:
+                print(f"Error reserving task ids: {e}")
+                first = None
+            if first is not None:
+                self.next_id = first
+                self.id_limit = first + block
+            else:
+                # No shared allocator: number after the local tasks
+                self.id_limit = self.next_id + count
+        first = self.next_id
+        self.next_id += count
+        return first
+    
+    def snapshot(self):
+        """Return the tasks to write into a snapshot"""
+        # Only the references are copied; records are encoded one at a time
+        return list(self.tasks)
+    
+    def save(self, op):
+        """Hand a single mutation record to the storage backend"""
+        self.storage.record(op, self.snapshot)
+        if self.on_save is not None:
+            self.on_save()
+    
+    def save_many(self, ops):
+        """Save the mutations of a bulk change as one record, written atomically"""
+        if ops:
+            self.save(batch_record(ops))
+    
+    def add(self, description, priority="medium", due=None):
+        """Add a new task and return it"""
+        task = Task(self.allocate_ids(), description, priority, due, now_timestamp())
+        self.tasks.add(task)
+        self.save({"op": "add", "task": task.to_dict()})
+        return task
+    
+    def complete(self, task_ids):
+        """Mark tasks as completed and return the ids that were pending"""
+        completed_at = now_text()
+        completed = self.tasks.complete_many(task_ids, completed_at)
+        self.save_many([{"op": "complete", "id": task_id, "completed_at": completed_at} for task_id in completed])
+        return completed
+    
+    def delete(self, task_ids):
+        """Delete tasks"""
+        self.tasks.remove_many(task_ids)
+        self.save_many([{"op": "delete", "id": task_id} for task_id in task_ids])
+    
+    def update(self, task_ids, fields):
+        """Apply the same attribute changes to several tasks"""
+        self.tasks.update_many(task_ids, fields)
+        keys = [FILE_KEYS.get(name, name) for name in fields]
+        self.save_many([{"op": "update", "id": task_id,
+                         "fields": {key: getattr(self.tasks.get(task_id), key) for key in keys}}
+                        for task_id in task_ids])
+    
+    def clear_completed(self):
+        """Remove all completed tasks and return their ids"""
+        removed = self.tasks.remove_completed()
+        if removed:
+            # The ids, not "whatever is completed": a snapshot may be written
+            # from tasks that changed after it was captured, and other
+            # instances may see the tasks in another state
+            self.save({"op": "clear_completed", "ids": removed})
+        return removed
+    
+    def archive_completed(self):
+        """Move all completed tasks to the archive and return them"""
+        tasks = [task for task in self.tasks if task.completed]
+        if tasks:
+            # The storage worker writes the archive, then journals the removal
+            removed = self.tasks.remove_completed()
+            self.save({"op": "archive", "ids": removed, "tasks": tasks})
+        return tasks
+    
+    def number(self, tasks):
+        """Give imported tasks new ids and return their add records"""
+        number_tasks(tasks, self.allocate_ids(len(tasks)))
+        return [{"op": "add", "task": task.to_dict()} for task in tasks]
+
+def batch_record(ops):
+    """Return the record saving several mutations at once"""
+    return ops[0] if len(ops) == 1 else {"op": "batch", "ops": ops}
+
+def number_tasks(tasks, first):
+    """Number new tasks from `first` on, dating the undated ones now"""
+    now = now_timestamp()
+    for task_id, task in enumerate(tasks, first):
+        task.id = task_id
+        if task.created is None:
+            task.created = now
+
+def stream_tasks(storage):
+    """Yield the stored tasks one at a time, without keeping them"""
+    for data in storage.iter_load():
+        yield Task.from_dict(data)
+
+def tally(tasks, today):
+    """Count a stream of tasks into TaskStats"""
+    stats = TaskStats(today)
+    for task in tasks:
+        stats.count(task)
+    return stats
+
+def smart_top(tasks, today, limit=None):
+    """Return the pending tasks of a stream in smart view order
+    
+    With a limit only that many tasks are kept while the stream is read.
+    """
+    entries = ((-smart_points(task, today), position, task)
+               for position, task in enumerate(tasks) if not task.completed)
+    if limit is None:
+        return [task for points, position, task in sorted(entries, key=lambda entry: entry[:2])]
+    return [task for points, position, task in heapq.nsmallest(limit, entries, key=lambda entry: entry[:2])]
+
+def stats_text(stats, archived=0):
+    """Return the text of the app's statistics line"""
+    if stats.total > 0:
+        text = (f"Total: {stats.total} | Completed: {stats.completed} | Pending: {stats.pending} | "
+                f"Completion: {stats.completion_rate:.1f}%")
+    else:
+        text = "No tasks yet"
+    if archived:
+        text += f" | Archived: {archived}"
+    return text
+
+def smart_stats_text(stats):
+    """Return the text of the smart view's counters"""
+    if not stats.pending:
+        return "No pending tasks"
+    return f"Pending: {stats.pending} | Overdue: {stats.overdue} | Due today: {stats.due_today}"
\ No newline at end of file
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+import os
+
+# Values of a CSV "completed" column read as True
+TRUE_VALUES = ("1", "true", "yes", "y", "x")
+
+class ImportSource:
+    """Tasks read from a CSV or NDJSON file
+    
+    Offers the `iter_load`/`load_progress` interface of the storage backends,
+    so a TaskLoader can stream an import in batches like the task file.
+    NDJSON files (.ndjson, .jsonl) hold one task object per line in the format
+    of the task file; CSV files need a header row with at least a
+    `description` column, and may have priority, due_date, created_at,
+    completed and completed_at columns. Ids in the file are ignored, since the
+    app numbers imported tasks itself. Rows without a description are
+    counted in `skipped`.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.load_progress = 0.0
+        self.skipped = 0
+    
+    def iter_load(self):
+        """Yield the tasks of the file as plain dicts"""
+        self.load_progress = 0.0
+        self.skipped = 0
+        size = max(1, os.path.getsize(self.path))
+        with open(self.path, 'rb') as f:
+            if os.path.splitext(self.path)[1].lower() == ".csv":
+                rows = read_csv(f)
+            else:
+                rows = read_ndjson(f)
+            for task in rows:
+                if not task.get("description"):
+                    self.skipped += 1
+                    continue
+                task.pop("id", None)
+                yield task
+                self.load_progress = f.tell() / size
+        self.load_progress = 1.0
+
+def read_ndjson(f):
+    """Yield the task objects of a binary NDJSON file"""
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            task = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}")
+        if not isinstance(task, dict):
+            raise ValueError(f"line {number}: expected a JSON object")
+        yield task
+
+def read_csv(f):
+    """Yield the rows of a binary CSV file as task dicts"""
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    fields = [name.strip().lower() for name in reader.fieldnames or ()]
+    if "description" not in fields:
+        raise ValueError("the CSV file needs a header row with a 'description' column")
+    reader.fieldnames = fields
+    for row in reader:
+        # Empty cells fall back to the defaults; columns without a header are dropped
+        task = {key: value.strip() for key, value in row.items()
+                if key and isinstance(value, str) and value.strip()}
+        task["completed"] = task.get("completed", "").lower() in TRUE_VALUES
+        if "priority" in task:
+            task["priority"] = task["priority"].lower()
+        yield task
\ No newline at end of file
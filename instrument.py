@@ -0,0 +1,100 @@
+import cProfile
+from collections import deque
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+
+class Tracer:
+    """Collects timing spans, counters and event loop lag samples
+    
+    Spans and lag samples go into bounded ring buffers, so tracing can stay on
+    permanently; appending to a deque is thread safe, which lets the storage
+    threads record spans too. `export` writes the buffers in the Chrome trace
+    event format, readable by chrome://tracing and Perfetto.
+    """
+    
+    def __init__(self, capacity=20000):
+        self.origin = time.perf_counter()
+        self.spans = deque(maxlen=capacity)   # (name, start, duration, thread id)
+        self.lag = deque(maxlen=capacity)     # (time, lag) in seconds
+        self.counters = {}
+        self.profiler = None
+    
+    @contextmanager
+    def span(self, name):
+        """Time the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start, time.perf_counter() - start, threading.get_ident()))
+    
+    def traced(self, name=None):
+        """Decorator timing every call of a function"""
+        def decorate(func):
+            label = name or func.__name__
+            @functools.wraps(func)
+            def wrapper(*args, **kw):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kw)
+                finally:
+                    self.spans.append((label, start, time.perf_counter() - start, threading.get_ident()))
+            return wrapper
+        return decorate
+    
+    def count(self, name, amount=1):
+        """Add to a counter"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def sample_lag(self, lag):
+        """Record how late a scheduled event loop callback ran"""
+        self.lag.append((time.perf_counter(), lag))
+    
+    def recent(self, window=200):
+        """Return {span name: (last, max)} in seconds over the latest spans"""
+        summary = {}
+        for name, start, duration, thread in list(self.spans)[-window:]:
+            worst = summary.get(name, (0.0, 0.0))[1]
+            summary[name] = (duration, max(worst, duration))
+        return summary
+    
+    def recent_lag(self, window=50):
+        """Return the (median, max) event loop lag over the latest samples"""
+        samples = sorted(lag for when, lag in list(self.lag)[-window:])
+        if not samples:
+            return 0.0, 0.0
+        return samples[len(samples) // 2], samples[-1]
+    
+    def start_profile(self):
+        """Start capturing a cProfile profile of the UI thread"""
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+    
+    def stop_profile(self, path):
+        """Stop profiling and write the stats to `path` (for pstats/snakeviz)"""
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(path)
+            self.profiler = None
+    
+    def export(self, path):
+        """Write spans, lag samples and counters as a Chrome trace file"""
+        pid = os.getpid()
+        events = []
+        for name, start, duration, thread in list(self.spans):
+            events.append({"name": name, "ph": "X", "pid": pid, "tid": thread,
+                           "ts": round((start - self.origin) * 1e6, 1), "dur": round(duration * 1e6, 1)})
+        for when, lag in list(self.lag):
+            events.append({"name": "event loop lag", "ph": "C", "pid": pid,
+                           "ts": round((when - self.origin) * 1e6, 1), "args": {"ms": round(lag * 1000, 3)}})
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "otherData": {"counters": dict(self.counters)}}, f)
+
+# Shared by the app, the view models and the storage threads
+tracer = Tracer()
+traced = tracer.traced
\ No newline at end of file
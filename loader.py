@@ -0,0 +1,49 @@
+import queue
+import threading
+
+from task import Task
+
+class TaskLoader(threading.Thread):
+    """Reads the stored tasks on a background thread
+    
+    Tasks are handed over in batches through a queue: a small first batch so
+    the UI can paint a screenful right away, then larger ones. The UI thread
+    drains the queue with `poll`; a final `None` marks the end of the load, and
+    an exception raised while reading is passed through the queue instead.
+    """
+    
+    first_chunk = 100
+    chunk_size = 5000
+    
+    def __init__(self, storage):
+        super().__init__(daemon=True)
+        self.storage = storage
+        self.batches = queue.Queue()
+    
+    @property
+    def progress(self):
+        """Fraction of the task file read so far"""
+        return self.storage.load_progress
+    
+    def run(self):
+        batch = []
+        size = self.first_chunk
+        try:
+            for data in self.storage.iter_load():
+                batch.append(Task.from_dict(data))
+                if len(batch) >= size:
+                    self.batches.put(batch)
+                    batch = []
+                    size = self.chunk_size
+            if batch:
+                self.batches.put(batch)
+            self.batches.put(None)
+        except Exception as e:
+            self.batches.put(e)
+    
+    def poll(self):
+        """Return the next batch, None when done, or False if nothing is ready"""
+        try:
+            return self.batches.get_nowait()
+        except queue.Empty:
+            return False
\ No newline at end of file
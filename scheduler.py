@@ -0,0 +1,48 @@
+class RefreshScheduler:
+    """Coalesces view refreshes into a single pass per event loop turn
+    
+    Views register a refresh callback under a name. Mutations only mark views
+    dirty, optionally for a set of keys (task ids) when only those items
+    changed; the first mark schedules one `after_idle` flush that calls each
+    dirty view once, in registration order, with the collected keys or None
+    for a full refresh.
+    
+    `before_flush` is called at the start of every flush, e.g. to read the
+    clock once for all the views; views it marks are refreshed in the same
+    pass.
+    """
+    
+    def __init__(self, root, before_flush=None):
+        self.root = root
+        self.before_flush = before_flush
+        self.views = {}     # name -> callback(keys or None)
+        self.dirty = {}     # name -> set of keys, or None for a full refresh
+        self.pending = None
+    
+    def register(self, name, callback):
+        """Add a view; views are refreshed in the order they are registered"""
+        self.views[name] = callback
+    
+    def mark(self, name, *keys):
+        """Mark a view dirty, for the given keys only or entirely"""
+        if name not in self.dirty:
+            self.dirty[name] = set(keys) if keys else None
+        elif self.dirty[name] is not None:
+            if keys:
+                self.dirty[name].update(keys)
+            else:
+                self.dirty[name] = None
+        if self.pending is None:
+            self.pending = self.root.after_idle(self.flush)
+    
+    def flush(self):
+        """Refresh every dirty view now"""
+        if self.before_flush is not None:
+            self.before_flush()
+        if self.pending is not None:
+            self.root.after_cancel(self.pending)
+            self.pending = None
+        dirty, self.dirty = self.dirty, {}
+        for name, callback in self.views.items():
+            if name in dirty:
+                callback(dirty[name])
\ No newline at end of file
@@ -0,0 +1,133 @@
+from functools import lru_cache
+
+# Stands in for a missing date; far enough in the past to never equal today
+NO_DAY = -(1 << 40)
+
+def smart_points(task, today):
+    """Return the smart view score of a task in quarter points (4 x score)
+    
+    Small ints are cached by Python, so ordering entries built from them do not
+    allocate a float per task.
+    """
+    # Priority weight (50%)
+    priority_weight = task.priority_weight
+    
+    # Due date weight (25%)
+    if task.due is not None:
+        days_until_due = task.due - today
+        if days_until_due < 0:  # Overdue
+            due_weight = 3
+        elif days_until_due == 0:  # Due today
+            due_weight = 2
+        else:  # Future due date
+            due_weight = 1
+    else:
+        due_weight = 0  # No due date
+    
+    # Creation time weight (25%) - newer tasks get higher priority
+    creation_weight = 1 if task.created_day == today else 0
+    
+    # Combined score: 0.5 * priority + 0.25 * due + 0.25 * creation
+    return 2 * priority_weight + due_weight + creation_weight
+
+@lru_cache(maxsize=None)
+def numpy_module():
+    """Return NumPy, or None if it is not installed
+    
+    Imported on first use rather than with this module, so the command line
+    does not pay for it at startup.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+class ScoreColumns:
+    """Columnar copy of the scoring fields of pending tasks, backed by NumPy
+    
+    Each task owns a slot in parallel arrays of priority weights, due days,
+    creation days (all epoch days) and insertion sequence numbers. Slots of
+    removed tasks are reused, so a mutation is a handful of element writes,
+    while re-scoring every task on a new day is a single vectorized pass and
+    one lexsort instead of a Python loop.
+    """
+    
+    def __init__(self, capacity=1024):
+        self.slots = {}     # task id -> slot
+        self.ids = []       # slot -> task id, None for free slots
+        self.free = []      # free slots below len(self.ids)
+        np = numpy_module()
+        self.priority = np.zeros(capacity, np.int64)
+        self.due = np.zeros(capacity, np.int64)
+        self.created = np.zeros(capacity, np.int64)
+        self.seq = np.zeros(capacity, np.int64)
+        self.live = np.zeros(capacity, bool)
+    
+    def __len__(self):
+        return len(self.slots)
+    
+    def set(self, task, seq):
+        """Store the scoring fields of a task and return its slot"""
+        slot = self.slots.get(task.id)
+        if slot is None:
+            slot = self._allocate(task.id)
+        due = task.due
+        created = task.created_day
+        self.priority[slot] = task.priority_weight
+        self.due[slot] = NO_DAY if due is None else due
+        self.created[slot] = NO_DAY if created is None else created
+        self.seq[slot] = seq
+        return slot
+    
+    def discard(self, task_id):
+        """Forget a task"""
+        slot = self.slots.pop(task_id, None)
+        if slot is not None:
+            self.live[slot] = False
+            self.ids[slot] = None
+            self.free.append(slot)
+    
+    def entries(self, today, slots=None):
+        """Return sorted smart view entries (-points, sequence, id)
+        
+        Covers every stored task, or only the given slots.
+        """
+        np = numpy_module()
+        if slots is None:
+            slots = np.flatnonzero(self.live[:len(self.ids)])
+        else:
+            slots = np.asarray(slots, np.intp)
+        due = self.due[slots]
+        # Due weight: 0 without a date, 1 in the future, 2 today, 3 overdue
+        due_weight = np.where(due > today, 1, np.where(due == today, 2, 3))
+        due_weight[due == NO_DAY] = 0
+        points = 2 * self.priority[slots] + due_weight + (self.created[slots] == today)
+        
+        order = np.lexsort((self.seq[slots], -points))
+        slots = slots[order]
+        ids = self.ids
+        return list(zip((-points[order]).tolist(), self.seq[slots].tolist(),
+                        [ids[slot] for slot in slots.tolist()]))
+    
+    def _allocate(self, task_id):
+        if self.free:
+            slot = self.free.pop()
+            self.ids[slot] = task_id
+        else:
+            slot = len(self.ids)
+            if slot == len(self.live):
+                self._grow()
+            self.ids.append(task_id)
+        self.slots[task_id] = slot
+        self.live[slot] = True
+        return slot
+    
+    def _grow(self):
+        np = numpy_module()
+        capacity = 2 * len(self.live)
+        for name in ("priority", "due", "created", "seq", "live"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
\ No newline at end of file
@@ -0,0 +1,110 @@
+import re
+
+WORD = re.compile(r"\w+")
+
+def tokenize(text):
+    """Return the distinct lowercase words of a text"""
+    return tuple(set(WORD.findall(text.lower())))
+
+def trigrams(token):
+    """Return the distinct three character substrings of a token"""
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+def grams(token):
+    """Return the distinct substrings of one to three characters of a token"""
+    return {token[i:i + size] for size in (1, 2, 3) for i in range(len(token) - size + 1)}
+
+class SearchIndex:
+    """Inverted index over task descriptions for substring search
+    
+    Each word maps to the ids of the tasks containing it, and each substring
+    of up to three characters maps to the words containing it. A search term
+    is looked up in the word vocabulary, which is far smaller than the task
+    list: the trigram sets of the term are intersected to find candidate
+    words, the words actually containing the term are kept, and their posting
+    sets are merged. Terms shorter than three characters map to their words
+    directly.
+    
+    Adding or removing a task only touches the entries of its own words.
+    """
+    
+    def __init__(self):
+        self.postings = {}  # word -> set of task ids
+        self.grams = {}     # substring of 1-3 characters -> set of words
+        self.words = {}     # task id -> words of its description
+    
+    def __len__(self):
+        return len(self.words)
+    
+    def add(self, task_id, text):
+        """Index a task's description, replacing any previous one"""
+        if task_id in self.words:
+            self.remove(task_id)
+        words = tokenize(text)
+        self.words[task_id] = words
+        postings = self.postings
+        for word in words:
+            ids = postings.get(word)
+            if ids is None:
+                postings[word] = {task_id}
+                for gram in grams(word):
+                    self.grams.setdefault(gram, set()).add(word)
+            else:
+                ids.add(task_id)
+    
+    def remove(self, task_id):
+        """Drop a task from the index"""
+        for word in self.words.pop(task_id, ()):
+            ids = self.postings[word]
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[word]
+                for gram in grams(word):
+                    words = self.grams[gram]
+                    words.discard(word)
+                    if not words:
+                        del self.grams[gram]
+    
+    def matching_words(self, piece):
+        """Return the indexed words containing `piece`"""
+        if len(piece) < 3:
+            return list(self.grams.get(piece, ()))
+        sets = []
+        for trigram in trigrams(piece):
+            words = self.grams.get(trigram)
+            if not words:
+                return []
+            sets.append(words)
+        sets.sort(key=len)
+        candidates = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+        return [word for word in candidates if piece in word]
+    
+    def match(self, terms):
+        """Return the ids of tasks whose description contains every term
+        
+        The result may be one of the index's own sets and must not be changed.
+        Terms made of several words (like "v1.2") match tasks containing each
+        word; callers check the exact substring on the returned candidates.
+        """
+        sets = []
+        for term in terms:
+            for piece in WORD.findall(term):
+                words = self.matching_words(piece)
+                if not words:
+                    return set()
+                if len(words) == 1:
+                    sets.append(self.postings[words[0]])
+                else:
+                    sets.append(set().union(*(self.postings[word] for word in words)))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+
+def parse_query(text):
+    """Split a search string into lowercase terms"""
+    return tuple(text.lower().split())
+
+def exact_terms(terms):
+    """Return the terms the word index cannot match exactly on its own"""
+    return [term for term in terms if WORD.fullmatch(term) is None]
\ No newline at end of file
@@ -0,0 +1,303 @@
+import json
+import os
+import sqlite3
+import threading
+
+from storage import JournalStorage, TaskStorage
+from task import format_day, format_timestamp
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    due_date TEXT,
+    created_at TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    completed_at TEXT,
+    extra TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tasks_position ON tasks (position);
+CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed, position);
+CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (completed, due_date);
+DROP INDEX IF EXISTS tasks_priority;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+COLUMNS = "id, description, priority, due_date, created_at, completed, completed_at, extra"
+
+# Statements are constant strings so sqlite3's statement cache keeps them
+# prepared for the lifetime of the connection
+INSERT_TASK = f"""
+    INSERT INTO tasks (position, {COLUMNS})
+    VALUES ((SELECT COALESCE(MAX(position), 0) + 1 FROM tasks), ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        description = excluded.description, priority = excluded.priority,
+        due_date = excluded.due_date, created_at = excluded.created_at,
+        completed = excluded.completed, completed_at = excluded.completed_at,
+        extra = excluded.extra
+"""
+COMPLETE_TASK = "UPDATE tasks SET completed = 1, completed_at = ? WHERE id = ?"
+DELETE_TASK = "DELETE FROM tasks WHERE id = ?"
+CLEAR_COMPLETED = "DELETE FROM tasks WHERE completed = 1"
+UPDATE_FIELDS = {
+    name: f"UPDATE tasks SET {name} = ? WHERE id = ?"
+    for name in ("description", "priority", "due_date", "created_at", "completed_at")
+}
+
+# Moves the stored next unused id past `count` more; the tasks' own ids
+# cover databases written before the counter existed
+RESERVE_IDS = """
+    INSERT INTO meta (key, value)
+    SELECT 'next_id', MAX(COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'next_id'), 1),
+                          COALESCE((SELECT MAX(id) FROM tasks), 0) + 1) + :count
+    WHERE true
+    ON CONFLICT (key) DO UPDATE SET value = excluded.value
+"""
+NEXT_ID = "SELECT CAST(value AS INTEGER) FROM meta WHERE key = 'next_id'"
+
+# Smart view score in quarter points, the same weights as scoring.smart_points
+SMART_POINTS = """
+    2 * (CASE priority WHEN 'high' THEN 3 WHEN 'medium' THEN 2 ELSE 1 END)
+    + (CASE WHEN due_date IS NULL OR due_date = '' THEN 0
+            WHEN due_date < :today THEN 3
+            WHEN due_date = :today THEN 2
+            ELSE 1 END)
+    + (CASE WHEN substr(created_at, 1, 10) = :today THEN 1 ELSE 0 END)
+"""
+
+class SqliteStorage(TaskStorage):
+    """Tasks stored as rows of a SQLite database
+    
+    Each mutation record becomes one prepared statement, and a batch of
+    records (or a "batch" record of a bulk change) is a single transaction. The database runs in WAL mode, so a
+    commit is a sequential append and other processes can read while the app
+    writes. The query methods (`page`, `smart_tasks`, `stats`) let callers
+    such as command line tools work without loading every task. `page`
+    reads through the position index and the due date counts of `stats`
+    through (completed, due_date); `smart_tasks` only finds the pending rows
+    by index and sorts them itself, as their score depends on the day.
+    
+    On first use the tasks of `migrate_from` (a JSON task file and its
+    journal) are copied into the database, followed by those of its
+    TaskArchive, `migrate_archive`; the old files are left untouched.
+    
+    Task ids are reserved from a `next_id` counter in the meta table, so
+    they are never reused after a delete, also by other processes sharing
+    the database.
+    """
+    
+    # SQLite keeps its own files compact, no snapshots are needed
+    compact_every = float("inf")
+    
+    batch_size = 1000
+    
+    def __init__(self, path, migrate_from=None, migrate_archive=None):
+        self.path = path
+        self.migrate_from = migrate_from
+        self.migrate_archive = migrate_archive
+        self.seq = 0
+        self.pending_ops = 0
+        self.load_progress = 0.0
+        self.last_error = None
+        self._lock = threading.Lock()
+        # Used from the loader and writer threads, always under self._lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        with self._lock, self._db:
+            self._db.executescript(SCHEMA)
+            self._db.execute("INSERT OR IGNORE INTO meta VALUES ('version', ?)", (str(SCHEMA_VERSION),))
+    
+    def iter_load(self):
+        """Yield the tasks in display order, migrating a JSON file first if needed"""
+        self.load_progress = 0.0
+        self.migrate()
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            cursor = self._db.execute(f"SELECT {COLUMNS} FROM tasks ORDER BY position")
+        loaded = 0
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row_to_dict(row)
+            loaded += len(rows)
+            self.load_progress = loaded / total
+        self.load_progress = 1.0
+    
+    def migrate(self):
+        """Copy the tasks of the JSON file into an empty database, once
+        
+        Returns the number of tasks copied, or None if there was nothing to do.
+        """
+        with self._lock:
+            done = self._db.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+        if done or not self.migrate_from:
+            return None
+        # Closing the source closes the archive too
+        source = JournalStorage(self.migrate_from, archive=self.migrate_archive)
+        self.migrate_archive = None
+        try:
+            archive = source.archive
+            if not (any(os.path.exists(path) for path in (source.path, source.journal_path, source.rotated_path))
+                    or archive is not None and len(archive)):
+                return None
+            count = 0
+            with self._lock, self._db:
+                # One transaction: an interrupted migration leaves nothing behind
+                # and is simply redone on the next start
+                for task in source.iter_load():
+                    self._db.execute(INSERT_TASK, dict_to_row(task))
+                    count += 1
+                # The database has no archive; archived tasks follow the others
+                # as in the app's task list
+                if archive is not None:
+                    for index in range(len(archive)):
+                        self._db.execute(INSERT_TASK, dict_to_row(archive[index].to_dict()))
+                    count += len(archive)
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (source.max_id + 1,))
+                self._db.execute("INSERT INTO meta VALUES ('migrated_from', ?)", (self.migrate_from,))
+        finally:
+            source.close()
+        return count
+    
+    def record(self, op, snapshot):
+        """Apply a single mutation record"""
+        self.append([op])
+    
+    def append(self, ops):
+        """Apply mutation records in one transaction"""
+        with self._lock, self._db:
+            for op in ops:
+                self._execute(op)
+        self.seq += len(ops)
+    
+    def reserve_ids(self, count):
+        """Reserve `count` consecutive task ids; return the first"""
+        with self._lock, self._db:
+            # The write comes first so the transaction holds the write lock
+            # before the counter is read back
+            self._db.execute(RESERVE_IDS, {"count": count})
+            return self._db.execute(NEXT_ID).fetchone()[0] - count
+    
+    def compact(self, snapshot):
+        """Nothing to do, the database is updated in place"""
+        pass
+    
+    def _execute(self, op):
+        kind = op.get("op")
+        if kind == "add":
+            self._db.execute(INSERT_TASK, dict_to_row(op["task"]))
+        elif kind == "update":
+            extra = {}
+            for name, value in op["fields"].items():
+                if name == "due_date":
+                    value = value or None
+                if name in UPDATE_FIELDS:
+                    self._db.execute(UPDATE_FIELDS[name], (value, op["id"]))
+                else:
+                    extra[name] = value
+            if extra:
+                self._update_extra(op["id"], extra)
+        elif kind == "complete":
+            self._db.execute(COMPLETE_TASK, (op.get("completed_at"), op["id"]))
+        elif kind == "delete":
+            self._db.execute(DELETE_TASK, (op["id"],))
+        elif kind == "clear_completed" and "ids" in op:
+            self._db.executemany(DELETE_TASK, [(task_id,) for task_id in op["ids"]])
+        elif kind == "clear_completed":
+            self._db.execute(CLEAR_COMPLETED)
+        elif kind == "batch":
+            for sub in op["ops"]:
+                self._execute(sub)
+    
+    def _update_extra(self, task_id, fields):
+        row = self._db.execute("SELECT extra FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is not None:
+            extra = json.loads(row[0]) if row[0] else {}
+            extra.update(fields)
+            self._db.execute("UPDATE tasks SET extra = ? WHERE id = ?", (json.dumps(extra), task_id))
+    
+    def page(self, offset, limit):
+        """Return `limit` tasks in display order starting at `offset`"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {COLUMNS} FROM tasks ORDER BY position LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [row_to_dict(row) for row in rows]
+    
+    def smart_tasks(self, today, limit=-1):
+        """Return pending tasks in smart view order for a YYYY-MM-DD day"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {COLUMNS} FROM tasks WHERE completed = 0 "
+                f"ORDER BY {SMART_POINTS} DESC, position LIMIT :limit",
+                {"today": today, "limit": limit}
+            ).fetchall()
+        return [row_to_dict(row) for row in rows]
+    
+    def stats(self, today):
+        """Return total, completed, overdue and due today counts for a YYYY-MM-DD day"""
+        with self._lock:
+            total, completed = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(completed), 0) FROM tasks"
+            ).fetchone()
+            overdue = self._db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE completed = 0 AND due_date > '' AND due_date < ?", (today,)
+            ).fetchone()[0]
+            due_today = self._db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE completed = 0 AND due_date = ?", (today,)
+            ).fetchone()[0]
+        return {"total": total, "completed": completed, "pending": total - completed,
+                "overdue": overdue, "due_today": due_today}
+    
+    def close(self):
+        """Close the database, and the archive if it was never migrated"""
+        if self.migrate_archive is not None:
+            self.migrate_archive.close()
+        with self._lock:
+            self._db.close()
+
+def dict_to_row(task):
+    """Return the INSERT_TASK parameters for a task dict"""
+    task = dict(task)
+    # NDJSON snapshots being migrated carry integer dates
+    if isinstance(task.get("due_date"), int):
+        task["due_date"] = format_day(task["due_date"])
+    if isinstance(task.get("created_at"), int):
+        task["created_at"] = format_timestamp(task["created_at"])
+    extra = {key: task.pop(key) for key in list(task)
+             if key not in ("id", "description", "priority", "due_date", "created_at",
+                            "completed", "completed_at", "sort_score")}
+    return (
+        task.get("id"),
+        task.get("description", ""),
+        task.get("priority", "medium"),
+        task.get("due_date") or None,
+        task.get("created_at"),
+        1 if task.get("completed") else 0,
+        task.get("completed_at"),
+        json.dumps(extra) if extra else None
+    )
+
+def row_to_dict(row):
+    """Return the JSON form of a task row"""
+    task_id, description, priority, due_date, created_at, completed, completed_at, extra = row
+    task = {"id": task_id, "description": description, "priority": priority, "due_date": due_date or ""}
+    if created_at is not None:
+        task["created_at"] = created_at
+    task["completed"] = bool(completed)
+    if completed_at is not None:
+        task["completed_at"] = completed_at
+    if extra:
+        task.update(json.loads(extra))
+    return task
\ No newline at end of file
@@ -0,0 +1,1069 @@
+import gzip
+import io
+import itertools
+import json
+import os
+import queue
+import threading
+
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+from filelock import FileLock
+from instrument import tracer
+from task import PRIORITIES, PRIORITY_CODES, Task
+
+SNAPSHOT_VERSION = 1
+
+# Snapshot formats and compressions, see write_atomic
+FORMATS = ("json", "ndjson")
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+NDJSON_VERSION = 1
+NDJSON_PREFIX = b'{"format":"tasks-ndjson"'
+NDJSON_FIELDS = ("id", "description", "priority", "due", "created", "completed", "completed_at", "extra")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+class TaskStorage:
+    """Base class for task storage backends"""
+    
+    def iter_load(self):
+        """Yield the stored tasks one at a time as plain dicts"""
+        raise NotImplementedError
+    
+    def record(self, op, snapshot):
+        """Persist a single mutation record
+        
+        `snapshot` is a callable returning the full list of tasks (dicts or
+        objects with a `to_dict` method), used by backends that need to rewrite
+        or compact the whole file.
+        """
+        raise NotImplementedError
+    
+    def close(self):
+        """Flush pending work and release resources"""
+        pass
+
+class JournalStorage(TaskStorage):
+    """Snapshot file plus an append-only journal of mutation records
+    
+    Every mutation is appended to `<path>.journal` as one JSON line and fsynced,
+    so a single edit costs O(1) disk I/O. Once enough records have accumulated the
+    journal is rotated and a fresh snapshot is written on a background thread.
+    Records carry a sequence number and the snapshot stores the last sequence it
+    contains, so replaying a journal that overlaps the snapshot is harmless.
+    A bulk change is a single "batch" record wrapping several mutations; being
+    one line, it is replayed entirely or not at all. Clearing completed tasks
+    records the ids it removed, so the record does not depend on the state
+    the tasks are in when it is replayed.
+    
+    With a TaskArchive, an "archive" record moves completed tasks into it: the
+    tasks are appended to the archive first, then the record is journaled as
+    a delete of their ids. The tasks of the archive's last batch are also
+    dropped on load, which covers a crash between the two writes.
+    
+    Several instances of the app may share the files. Appends, id
+    reservations and the file steps of a compaction hold a FileLock on
+    `<path>.lock`. Writes are optimistic: before appending, an instance reads
+    the records other instances added since it last looked, so its own
+    records take the next sequence numbers and land after everything it has
+    seen. The external records wait for `poll_changes`. Task ids are handed
+    out by "reserve" records, so two instances never add the same id, and
+    the snapshot header keeps the next unused id, so the ids of deleted
+    tasks are not handed out again once their records are compacted away. A
+    compaction only goes ahead when the captured task list includes every
+    external record read so far, and a snapshot never replaces a newer one.
+    """
+    
+    def __init__(self, path, compact_every=1000, format="json", compression="none", archive=None):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.rotated_path = path + ".journal.old"
+        self.compact_every = compact_every
+        # Only used for writing; snapshots of any format are read
+        self.format = format
+        self.compression = compression
+        self.archive = archive
+        self.seq = 0
+        self.max_id = 0             # largest task id used or reserved in the file
+        self.pending_ops = 0
+        self.load_progress = 0.0
+        self.last_error = None
+        self.merged = 0             # external records handed out by poll_changes
+        self._external_count = 0    # external records read so far
+        self._external = []         # external records not handed out yet
+        self._own = []              # records written here since the first of those
+        self._resync = False
+        self._journal_id = None     # identity of the journal read up to _offset
+        self._offset = 0
+        self._archived = None       # last archive record written, for retries
+        self._compactor = None
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(path + ".lock")
+    
+    def iter_load(self):
+        """Yield stored tasks one at a time, patched with the journal tail
+        
+        The snapshot is parsed incrementally, so callers can show the first
+        tasks before the whole file has been read; `load_progress` tracks the
+        fraction of the snapshot consumed so far. Its format and compression
+        are detected from the content. Tasks read from an NDJSON snapshot
+        carry their dates as integers (days and seconds since 1970-01-01),
+        which Task.from_dict takes as they are.
+        """
+        with self._file_lock:
+            # A torn last line may be another instance's append in progress,
+            # so the journal is only truncated with the lock held
+            ops = read_journal(self.rotated_path) + read_journal(self.journal_path, truncate=True)
+            self._journal_id = file_id(self.journal_path)
+            self._offset = os.path.getsize(self.journal_path) if self._journal_id is not None else 0
+        journal_seq = max((op["seq"] for op in ops), default=0)
+        reserved = max((op["last"] for op in ops if op.get("op") == "reserve"), default=0)
+        header_seq, max_id, pending = yield from self._replay(ops)
+        
+        self.seq = max(header_seq, journal_seq)
+        # Reserved ids and those of tasks added then deleted stay taken
+        self.max_id = max(max_id, reserved)
+        for op in ops:
+            self._note_ids(flatten(op))
+        self.pending_ops = pending
+        self.load_progress = 1.0
+    
+    def _replay(self, ops):
+        """Yield the snapshot's tasks patched with the journal records `ops`
+        
+        Returns the snapshot's sequence number, the largest task id seen and
+        the number of records not in the snapshot yet.
+        """
+        ops = [op for op in ops if op.get("op") != "reserve"]
+        archived = set(self.archive.last_batch_ids()) if self.archive is not None else set()
+        self.load_progress = 0.0
+        header = {}
+        overlay = None
+        seen = set()
+        duplicates = []
+        max_id = self.archive.max_id if self.archive is not None else 0
+        next_id = 1
+        
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                reader = snapshot_reader(f, os.path.getsize(self.path), header)
+                for task in reader.tasks():
+                    if overlay is None:
+                        # The header precedes the task array, so its sequence
+                        # number is known before the first task arrives
+                        overlay = JournalOverlay(ops, header.get("seq", 0))
+                    task_id = task.get("id")
+                    if task_id in archived:
+                        continue
+                    if task_id in seen:
+                        duplicates.append(task)
+                        continue
+                    seen.add(task_id)
+                    if isinstance(task_id, int):
+                        max_id = max(max_id, task_id)
+                    task = overlay.patch(task)
+                    if task is not None:
+                        self.load_progress = reader.progress()
+                        yield task
+        if overlay is None:
+            overlay = JournalOverlay(ops, header.get("seq", 0))
+        if isinstance(header.get("next_id"), int):
+            next_id = header["next_id"]
+        max_id = max(max_id, next_id - 1)
+        
+        # Duplicate ids from files written by older versions are renumbered
+        # after the largest id, so journal records stay unambiguous
+        for task in duplicates:
+            max_id += 1
+            task["id"] = max_id
+            seen.add(max_id)
+            task = overlay.patch(task)
+            if task is not None:
+                yield task
+        yield from (task for task in overlay.added(seen) if task.get("id") not in archived)
+        return header.get("seq", 0), max_id, len(overlay.ops)
+    
+    def read_tail(self):
+        """Read the journal and the snapshot header, but none of the tasks
+        
+        Enough to append records and reserve ids without loading the file.
+        Returns False, reading nothing, when the snapshot comes from an older
+        version without the next unused id; the tasks then have to be read
+        for the ids in use.
+        """
+        with self._file_lock:
+            # Under the lock, so no compaction replaces the snapshot in between
+            header = snapshot_header(self.path)
+            if os.path.exists(self.path) and not isinstance(header.get("next_id"), int):
+                return False
+            ops = read_journal(self.rotated_path) + read_journal(self.journal_path, truncate=True)
+            self._journal_id = file_id(self.journal_path)
+            self._offset = os.path.getsize(self.journal_path) if self._journal_id is not None else 0
+        seq = header.get("seq", 0)
+        self.seq = max([seq] + [op["seq"] for op in ops])
+        self.max_id = max(header.get("next_id", 1) - 1, self.archive.max_id if self.archive is not None else 0)
+        for op in ops:
+            if op.get("op") == "reserve":
+                self.max_id = max(self.max_id, op["last"])
+            else:
+                self._note_ids([op])
+        self.pending_ops = sum(1 for op in ops if op.get("op") != "reserve" and op["seq"] > seq)
+        return True
+    
+    def record(self, op, snapshot):
+        """Append a mutation to the journal, compacting when it grows too long"""
+        self.append([op])
+        if self.pending_ops >= self.compact_every:
+            self.compact(snapshot)
+    
+    def append(self, ops):
+        """Append mutation records to the journal with a single fsync"""
+        with self._lock, self._file_lock:
+            self._read_external()
+            if not self._external:
+                # Local records are only replayed around external ones
+                self._own = []
+            seq = self.seq
+            records = []
+            for op in ops:
+                seq += 1
+                if op.get("op") == "archive":
+                    # A retried record finds its tasks already archived
+                    if op is not self._archived:
+                        self.archive.append(op["tasks"])
+                        self._archived = op
+                    op = {"op": "archive", "ids": op["ids"]}
+                records.append(dict(op, seq=seq))
+            self._write(records, sync=True)
+            self.seq = seq
+            for record in records:
+                parts = flatten(record)
+                self._own += parts
+                self._note_ids(parts)
+        self.pending_ops += sum(map(op_size, ops))
+    
+    def reserve_ids(self, count):
+        """Reserve `count` consecutive task ids for this instance; return the first"""
+        with self._lock, self._file_lock:
+            self._read_external()
+            first = self.max_id + 1
+            # Not fsynced: other instances only need to see it, and after a
+            # crash the records of tasks using the ids carry them anyway
+            self._write([{"op": "reserve", "last": self.max_id + count, "seq": self.seq + 1}], sync=False)
+            self.max_id += count
+            self.seq += 1
+        return first
+    
+    def poll_changes(self):
+        """Return the records other instances wrote since the last call
+        
+        Returns None when there is nothing new, or while the writer thread
+        holds the journal. Otherwise returns `(records, reload)`: the external
+        records, merged in sequence order with the records written here after
+        the first of them, which have to be applied again on top. `reload` is
+        True when another instance compacted records this one never read into
+        its snapshot; the whole file then has to be read again.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            # Without the file lock: only whole lines are read, and a
+            # rotation is detected from the journal's identity
+            self._read_external()
+            if self._resync:
+                self._resync = False
+                self._external, self._own = [], []
+                self.merged = self._external_count
+                return [], True
+            if not self._external:
+                return None
+            first = self._external[0]["seq"]
+            records = sorted(self._external + [op for op in self._own if op["seq"] > first],
+                             key=lambda op: op["seq"])
+            self._external, self._own = [], []
+            self.merged = self._external_count
+            return records, False
+        finally:
+            self._lock.release()
+    
+    def _read_external(self):
+        """Collect the records other instances appended since the last read
+        
+        Called with `_lock` held. An append still in progress elsewhere is
+        picked up by a later call.
+        """
+        ops = []
+        try:
+            journal = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            journal = None
+        try:
+            current = os.fstat(journal.fileno()) if journal is not None else None
+            current = (current.st_dev, current.st_ino) if current is not None else None
+            if self._journal_id is not None and current != self._journal_id:
+                # Another instance rotated the journal to compact it; finish
+                # reading it under its new name if it is still there
+                if not self._read_rotated(ops):
+                    header = snapshot_header(self.path)
+                    if header.get("seq", 0) > self.seq:
+                        self._resync = True
+                        self.seq = header["seq"]
+                        # The records holding the ids it used are gone with it
+                        self.max_id = max(self.max_id, header.get("next_id", 1) - 1)
+                self._journal_id, self._offset = None, 0
+            if journal is not None:
+                journal.seek(self._offset)
+                self._offset += parse_records(journal, ops)
+                self._journal_id = current
+        finally:
+            if journal is not None:
+                journal.close()
+        
+        ops = [op for op in ops if op["seq"] > self.seq]
+        for op in ops:
+            self.seq = max(self.seq, op["seq"])
+            kind = op.get("op")
+            if kind == "reserve":
+                self.max_id = max(self.max_id, op["last"])
+            else:
+                self._note_ids(flatten(op))
+        ops = [op for op in ops if op.get("op") != "reserve"]
+        if ops and self.archive is not None:
+            # The records may come from moving tasks to the archive
+            self.archive.reload()
+        self._external += ops
+        self._external_count += len(ops)
+    
+    def _note_ids(self, ops):
+        """Keep `max_id` at or above the ids of the tasks the records add"""
+        for op in ops:
+            if op.get("op") == "add" and isinstance(op["task"].get("id"), int):
+                self.max_id = max(self.max_id, op["task"]["id"])
+    
+    def _read_rotated(self, ops):
+        """Read the rest of a journal another instance rotated; False if it is gone"""
+        try:
+            with open(self.rotated_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if (stat.st_dev, stat.st_ino) != self._journal_id:
+                    return False
+                f.seek(self._offset)
+                parse_records(f, ops)
+                return True
+        except FileNotFoundError:
+            return False
+    
+    def _write(self, records, sync):
+        """Append records to the journal, with `_lock` and the file lock held"""
+        data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode()
+        journal = open(self.journal_path, 'ab')
+        start = os.fstat(journal.fileno()).st_size
+        try:
+            journal.write(data)
+            journal.flush()
+            if sync:
+                os.fsync(journal.fileno())
+        except OSError:
+            self._discard_tail(journal, start)
+            raise
+        stat = os.fstat(journal.fileno())
+        journal.close()
+        # Everything before `start` was read under the same lock
+        self._journal_id = (stat.st_dev, stat.st_ino)
+        self._offset = start + len(data)
+    
+    def _discard_tail(self, journal, size):
+        """Drop a partially written append so a retry starts on a clean line"""
+        try:
+            journal.close()
+        except OSError:
+            pass
+        try:
+            os.truncate(self.journal_path, size)
+        except OSError:
+            pass
+    
+    def compact(self, snapshot, merged=None):
+        """Write a new snapshot in the background and retire the current journal
+        
+        `merged` is the value of `merged` when the task list was captured,
+        by default the current one. Returns False when the compaction was
+        skipped: while another one runs, or when external records read since
+        the capture are missing from the task list.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return False
+        tasks = snapshot()
+        with self._lock, self._file_lock:
+            self._read_external()
+            if self._external_count != (self.merged if merged is None else merged):
+                return False
+            seq = self.seq
+            next_id = self.max_id + 1
+            # A leftover rotated journal means an earlier compaction failed or
+            # another instance's is still running; keep it and let the
+            # sequence numbers skip the already compacted records
+            if not os.path.exists(self.rotated_path) and os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.rotated_path)
+                self._journal_id, self._offset = None, 0
+        self.pending_ops = 0
+        self._compactor = threading.Thread(target=self._write_snapshot, args=(tasks, seq, next_id))
+        self._compactor.start()
+        return True
+    
+    def compact_file(self):
+        """Compact without the tasks in memory, streaming them from the files
+        
+        For callers that never load the tasks, like the command line. The
+        journal is rotated as in `compact`, then the snapshot and the rotated
+        records are merged into the new snapshot on the calling thread.
+        Returns False when another compaction is in progress.
+        """
+        with self._lock, self._file_lock:
+            self._read_external()
+            if os.path.exists(self.rotated_path):
+                return False
+            seq = self.seq
+            next_id = self.max_id + 1
+            ops = read_journal(self.journal_path)
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.rotated_path)
+                self._journal_id, self._offset = None, 0
+        self.pending_ops = 0
+        # The rotated journal holds every record up to `seq` the snapshot lacks
+        self._write_snapshot(map(Task.from_dict, self._replay(ops)), seq, next_id)
+        return self.last_error is None
+    
+    def _write_snapshot(self, tasks, seq, next_id):
+        """Write the snapshot atomically and drop the rotated journal once covered"""
+        # Instances write their own temp file and only the rename is locked
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            write_file(tmp_path, {"version": SNAPSHOT_VERSION, "seq": seq, "next_id": next_id, "tasks": tasks},
+                       self.format, self.compression)
+            with self._file_lock:
+                top = snapshot_seq(self.path)
+                if top > seq:
+                    # Another instance finished a newer snapshot meanwhile
+                    os.remove(tmp_path)
+                else:
+                    os.replace(tmp_path, self.path)
+                    fsync_dir(self.path)
+                    top = seq
+                rotated = read_journal(self.rotated_path)
+                if os.path.exists(self.rotated_path) and max((op["seq"] for op in rotated), default=0) <= top:
+                    os.remove(self.rotated_path)
+            self.last_error = None
+        except (OSError, ValueError) as e:
+            self.last_error = e
+            print(f"Error compacting task journal: {e}")
+    
+    def close(self):
+        """Wait for a running compaction and release the files"""
+        if self._compactor is not None:
+            self._compactor.join()
+        self._file_lock.close()
+        if self.archive is not None:
+            self.archive.close()
+
+class WriteBehindStorage(TaskStorage):
+    """Runs the writes of a storage backend on a worker thread
+    
+    `record` only queues the mutation, so the UI thread never waits for the
+    disk. The worker takes everything queued since its last write and appends
+    it with a single fsync, so a burst of edits costs one write. When a
+    snapshot is due, the task list is captured by `record` on the calling
+    thread, and the worker compacts right after writing that record, which
+    keeps the snapshot consistent with the journal sequence.
+    
+    Outcomes are posted to `events` as ("saved", None) or ("failed", error)
+    for the UI thread to poll. Failed records stay queued and are retried.
+    The wrapped backend provides `append(ops)` and `compact(snapshot)`, and
+    optionally the multi-instance support of JournalStorage (`merged`,
+    `reserve_ids` and `poll_changes`).
+    """
+    
+    retry_delay = 2.0
+    
+    def __init__(self, storage):
+        self.storage = storage
+        self.pending_ops = 0
+        self.last_error = None
+        self.events = queue.Queue()
+        self.compact_retry = False
+        self._queue = []    # (op, None or (captured tasks, merged count)) not written yet
+        self._writing = []  # the part of the queue the worker is writing
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    @property
+    def load_progress(self):
+        return self.storage.load_progress
+    
+    @property
+    def archive(self):
+        return getattr(self.storage, "archive", None)
+    
+    def reserve_ids(self, count):
+        """Reserve task ids through the backend; None if it has no shared allocator"""
+        reserve = getattr(self.storage, "reserve_ids", None)
+        return reserve(count) if reserve is not None else None
+    
+    def poll_changes(self):
+        """Return the changes of other instances like JournalStorage.poll_changes
+        
+        The records still queued here come last: they were applied locally
+        already and will be written after everything read so far.
+        """
+        poll = getattr(self.storage, "poll_changes", None)
+        if poll is None:
+            return None
+        # Taken before polling, so a record written in between is applied
+        # twice rather than missed
+        with self._cond:
+            queued = [op for op, capture in self._writing + self._queue]
+        changes = poll()
+        if changes is None:
+            return None
+        records, reload = changes
+        return records + [part for op in queued for part in flatten(op)], reload
+    
+    def iter_load(self):
+        """Stream the tasks from the wrapped storage"""
+        yield from self.storage.iter_load()
+        self.pending_ops = self.storage.pending_ops
+    
+    def record(self, op, snapshot):
+        """Queue a mutation for the worker"""
+        capture = None
+        self.pending_ops += op_size(op)
+        if self.pending_ops >= self.storage.compact_every or self.compact_retry:
+            # The snapshot holds the external records merged up to now
+            capture = (snapshot(), getattr(self.storage, "merged", None))
+            self.pending_ops = 0
+            self.compact_retry = False
+        with self._cond:
+            self._queue.append((op, capture))
+            self._cond.notify()
+    
+    def saving(self):
+        """Return True while queued records have not been written"""
+        with self._cond:
+            return bool(self._queue) or self._busy
+    
+    def close(self):
+        """Write everything still queued, stop the worker and close the journal"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+        self.storage.close()
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                batch, self._queue = self._queue, []
+                self._writing = batch
+                self._busy = True
+            try:
+                with tracer.span("storage write"):
+                    self._write(batch)
+                self.last_error = None
+                self.events.put(("saved", None))
+            except Exception as e:
+                # Whatever went wrong, the worker has to stay alive and keep
+                # the records, or later saves would be lost without notice
+                self.last_error = e
+                print(f"Error saving tasks: {e}")
+                self.events.put(("failed", e))
+                with self._cond:
+                    # Unwritten records go back in front of newer ones
+                    self._queue[:0] = batch
+                    if self._closed:
+                        return
+                    self._cond.wait(self.retry_delay)
+            finally:
+                with self._cond:
+                    self._writing = []
+                    self._busy = False
+    
+    def _write(self, batch):
+        """Append a batch, compacting after each record that captured a snapshot
+        
+        Written records are removed from `batch`, so after a failure it holds
+        exactly the records still to be written.
+        """
+        while batch:
+            end = next((i + 1 for i, (op, capture) in enumerate(batch) if capture is not None), len(batch))
+            self.storage.append([op for op, capture in batch[:end]])
+            capture = batch[end - 1][1]
+            del batch[:end]
+            if capture is not None:
+                tasks, merged = capture
+                if merged is None:
+                    self.storage.compact(lambda: tasks)
+                elif not self.storage.compact(lambda: tasks, merged):
+                    # Try again with the next record
+                    self.compact_retry = True
+
+class SnapshotReader:
+    """Incremental reader for snapshot files
+    
+    Accepts both the current `{"version", "seq", "tasks": [...]}` layout and
+    the bare task list written by older versions. Top-level keys other than
+    `tasks` are collected into `header`; tasks are decoded one at a time with
+    `JSONDecoder.raw_decode` over a sliding buffer.
+    """
+    
+    chunk_size = 1 << 16
+    
+    def __init__(self, f, size, header):
+        self.f = f
+        self.size = size
+        self.header = header
+        self.buf = ""
+        self.pos = 0
+        self.consumed = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+    
+    def progress(self):
+        """Return the approximate fraction of the file consumed"""
+        return min(1.0, (self.consumed + self.pos) / self.size) if self.size else 1.0
+    
+    def tasks(self):
+        """Yield the task dicts of the snapshot"""
+        first = self._peek()
+        if first == "[":
+            yield from self._array()
+        elif first == "{":
+            self.pos += 1
+            while self._peek() != "}":
+                if self._peek() == ",":
+                    self.pos += 1
+                    continue
+                key = self._value()
+                if self._peek() != ":":
+                    raise ValueError("Malformed task file")
+                self.pos += 1
+                if key == "tasks" and self._peek() == "[":
+                    yield from self._array()
+                else:
+                    self.header[key] = self._value()
+        elif first:
+            raise ValueError("Unrecognized task file format")
+    
+    def _array(self):
+        self.pos += 1
+        while True:
+            c = self._peek()
+            if c == "]":
+                self.pos += 1
+                return
+            if c == ",":
+                self.pos += 1
+                continue
+            if not c:
+                raise ValueError("Truncated task file")
+            yield self._value()
+    
+    def _fill(self):
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return
+        self.consumed += self.pos
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+    
+    def _peek(self):
+        """Skip whitespace and return the next character ("" at the end)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ""
+            self._fill()
+    
+    def _value(self):
+        """Decode the next JSON value, reading more input as needed"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number at the very end of the buffer may continue in the
+                # next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+class NdjsonReader:
+    """Reader for NDJSON snapshots
+    
+    The first line is a header object; every other line is one task as a
+    JSON array in NDJSON_FIELDS order, with the priority as a code and the
+    dates as integers. Trailing empty fields are left out. Lines are decoded
+    a large block at a time, wrapped into a single JSON array, which is much
+    faster than decoding them one by one.
+    """
+    
+    # A small first block gets the first tasks on screen sooner
+    first_chunk = 1 << 14
+    chunk_size = 1 << 20
+    
+    def __init__(self, f, raw, size, header):
+        self.f = f          # the decompressed stream
+        self.raw = raw      # the file itself, for the progress
+        self.size = size
+        self.header = header
+        self.fraction = 0.0
+    
+    def progress(self):
+        """Return the approximate fraction of the file consumed"""
+        return self.fraction
+    
+    def tasks(self):
+        """Yield the task dicts of the snapshot"""
+        self.header.update(json.loads(self.f.readline()))
+        if self.header.get("version", 0) > NDJSON_VERSION:
+            raise ValueError("Task file written by a newer version of the app")
+        rest = b""
+        chunk = self.first_chunk
+        while True:
+            data = self.f.read(chunk)
+            chunk = self.chunk_size
+            block = rest + data
+            if data:
+                end = block.rfind(b"\n") + 1
+                block, rest = block[:end], block[end:]
+            block = block.strip()
+            if self.size:
+                self.fraction = min(1.0, self.raw.tell() / self.size)
+            if block:
+                yield from map(ndjson_task, json.loads(b"[" + block.replace(b"\n", b",") + b"]"))
+            if not data:
+                return
+
+class JournalOverlay:
+    """Journal records grouped by task id
+    
+    Lets a streamed snapshot be patched one task at a time instead of
+    replaying the journal over a fully materialized task list. Records at or
+    below the snapshot's sequence number are already part of it and skipped.
+    """
+    
+    def __init__(self, ops, snapshot_seq):
+        self.ops = [op for op in ops if op.get("seq", 0) > snapshot_seq]
+        self.by_id = {}       # task id -> indexes into self.ops
+        self.clears = []      # indexes of clear_completed records
+        self.recreated = set()
+        for index, op in enumerate(self.ops):
+            if op.get("op") == "clear_completed":
+                self.clears.append(index)
+            else:
+                task_id = op["task"]["id"] if op.get("op") == "add" else op.get("id")
+                self.by_id.setdefault(task_id, []).append(index)
+    
+    def _replay(self, task_id, task):
+        """Apply the records touching one task; return (task, index of the creating add)"""
+        indexes = self.by_id.get(task_id, [])
+        if self.clears:
+            indexes = sorted(indexes + self.clears)
+        index = {task_id: task} if task is not None else {}
+        created = None
+        for i in indexes:
+            op = self.ops[i]
+            if op.get("op") == "add":
+                # A task may be replayed more than once; keep the record intact
+                op = dict(op, task=dict(op["task"]))
+            present = task_id in index
+            apply_op(index, op)
+            if not present and task_id in index:
+                created = i
+        return index.get(task_id), created
+    
+    def patch(self, task):
+        """Return a snapshot task with its journal records applied, or None"""
+        task_id = task.get("id")
+        if task_id not in self.by_id:
+            # Only clear_completed can affect a task without records of its own
+            return None if self.clears and task.get("completed") else task
+        patched, created = self._replay(task_id, task)
+        if created is not None:
+            # Deleted and added again: it belongs at the end like a new task
+            self.recreated.add(task_id)
+            return None
+        return patched
+    
+    def added(self, seen):
+        """Return the tasks created by the journal, in the order they were added"""
+        added = []
+        for task_id in self.by_id:
+            if task_id in seen and task_id not in self.recreated:
+                continue
+            task, created = self._replay(task_id, None)
+            if task is not None:
+                added.append((created, task))
+        added.sort(key=lambda pair: pair[0])
+        return [task for created, task in added]
+
+def apply_op(index, op):
+    """Apply a journal record to an id -> task dict"""
+    kind = op.get("op")
+    if kind == "add":
+        task = op["task"]
+        index[task["id"]] = task
+    elif kind == "update":
+        task = index.get(op["id"])
+        if task is not None:
+            task.update(op["fields"])
+    elif kind == "complete":
+        task = index.get(op["id"])
+        if task is not None:
+            task["completed"] = True
+            task["completed_at"] = op.get("completed_at")
+    elif kind == "delete":
+        index.pop(op["id"], None)
+    elif kind == "archive":
+        for task_id in op["ids"]:
+            index.pop(task_id, None)
+    elif kind == "clear_completed":
+        for task_id in [i for i, t in index.items() if t.get("completed")]:
+            del index[task_id]
+    elif kind == "batch":
+        for sub in op["ops"]:
+            apply_op(index, sub)
+
+def op_size(op):
+    """Return the number of mutations in a record"""
+    kind = op.get("op")
+    if kind == "batch":
+        return len(op["ops"])
+    # Archived and cleared tasks stay in the snapshot until the next compaction
+    return len(op["ids"]) if "ids" in op else 1
+
+def read_journal(path, truncate=False):
+    """Return the records of a journal file
+    
+    A torn final line left by a crash ends the replay; with `truncate` it is cut
+    off so that later appends start on a clean line.
+    """
+    if not os.path.exists(path):
+        return []
+    ops = []
+    with open(path, 'rb') as f:
+        good = parse_records(f, ops)
+    if truncate and good < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(good)
+    return ops
+
+def parse_records(f, ops):
+    """Add the whole records of a binary journal file, from its position on, to `ops`
+    
+    Returns the number of bytes consumed; an incomplete or torn line ends
+    the read.
+    """
+    good = 0
+    for line in f:
+        if not line.endswith(b"\n"):
+            break
+        try:
+            op = json.loads(line)
+        except ValueError:
+            break
+        good += len(line)
+        ops += flatten(op)
+    return good
+
+def flatten(op):
+    """Return the mutations of a record as separate records
+    
+    The parts of a batch share its sequence number; an archive record, or a
+    clear_completed record listing its ids, becomes a delete per task.
+    Older clear_completed records without ids are kept as they are.
+    """
+    kind = op.get("op")
+    if kind == "batch":
+        return [dict(sub, seq=op.get("seq")) for sub in op["ops"]]
+    if kind == "archive" or kind == "clear_completed" and "ids" in op:
+        return [{"op": "delete", "id": task_id, "seq": op.get("seq")} for task_id in op["ids"]]
+    return [op]
+
+def file_id(path):
+    """Return the (device, inode) identity of a file, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+def write_atomic(path, data, format="json", compression="none"):
+    """Write a snapshot to a temp file, fsync it and rename it over `path`
+    
+    `data` is a header dict holding the task list under "tasks" (a bare list
+    is accepted for the json format). The json format is a single JSON
+    document; ndjson writes the NDJSON records read by NdjsonReader. Either
+    can be compressed with gzip, or zstd when the zstandard package is
+    installed.
+    """
+    tmp_path = path + ".tmp"
+    write_file(tmp_path, data, format, compression)
+    os.replace(tmp_path, path)
+    fsync_dir(path)
+
+def write_file(path, data, format="json", compression="none"):
+    """Write a snapshot to `path` and fsync it, see write_atomic"""
+    with open(path, 'wb') as raw:
+        f = compressor(raw, compression)
+        if format == "ndjson":
+            write_ndjson(f, data)
+        elif isinstance(data, dict) and not isinstance(data["tasks"], list):
+            write_json_stream(f, data)
+        else:
+            text = io.TextIOWrapper(f, encoding="utf-8")
+            # Task records are converted one at a time while encoding; without
+            # indent json uses its C encoder, several times faster
+            json.dump(data, text, separators=(",", ":"), default=lambda task: task.to_dict())
+            text.flush()
+            text.detach()
+        if f is not raw:
+            f.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+
+def write_ndjson(f, data):
+    """Write the header line and the task records of an NDJSON snapshot"""
+    header = {"format": "tasks-ndjson", "version": NDJSON_VERSION, "fields": NDJSON_FIELDS}
+    header.update((key, value) for key, value in data.items() if key not in ("tasks", "version"))
+    f.write(json.dumps(header, separators=(",", ":")).encode() + b"\n")
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    # Encoded in blocks to keep memory flat on large lists
+    for block in blocks(data["tasks"]):
+        f.write("".join([encode(ndjson_row(task)) + "\n" for task in block]).encode())
+
+def write_json_stream(f, data):
+    """Write a JSON snapshot whose tasks come from an iterator, a block at a time"""
+    encode = json.JSONEncoder(separators=(",", ":"), default=lambda task: task.to_dict()).encode
+    # The header keys come first, as SnapshotReader expects
+    header = encode({key: value for key, value in data.items() if key != "tasks"})
+    f.write(header[:-1].encode() + (b"," if len(header) > 2 else b"") + b'"tasks":[')
+    separator = b""
+    for block in blocks(data["tasks"]):
+        f.write(separator + encode(block)[1:-1].encode())
+        separator = b","
+    f.write(b"]}")
+
+def blocks(items, size=10000):
+    """Yield the items of an iterable as lists of up to `size`"""
+    items = iter(items)
+    while True:
+        block = list(itertools.islice(items, size))
+        if not block:
+            return
+        yield block
+
+def ndjson_row(task):
+    """Return the NDJSON record of a task (a Task or its JSON form)"""
+    if isinstance(task, dict):
+        task = Task.from_dict(task)
+    priority = task.priority
+    row = [task.id, task.description, PRIORITY_CODES.get(priority, priority), task.due, task.created,
+           1 if task.completed else 0, task.completed_at, task.extra]
+    while row[-1] is None:
+        row.pop()
+    return row
+
+def ndjson_task(row):
+    """Return the JSON form of an NDJSON record, with integer dates"""
+    if len(row) < 8:
+        row += [None] * (8 - len(row))
+    task_id, description, priority, due, created, completed, completed_at, extra = row
+    task = {
+        "id": task_id,
+        "description": description,
+        "priority": PRIORITIES[priority] if priority.__class__ is int else priority,
+        "due_date": "" if due is None else due
+    }
+    if created is not None:
+        task["created_at"] = created
+    task["completed"] = completed == 1
+    if completed_at is not None:
+        task["completed_at"] = completed_at
+    if extra:
+        task.update(extra)
+    return task
+
+def snapshot_seq(path):
+    """Return the sequence number stored in a snapshot, 0 if there is none"""
+    return snapshot_header(path).get("seq", 0)
+
+def snapshot_header(path):
+    """Return the header fields of a snapshot, empty if there is none"""
+    header = {}
+    if not os.path.exists(path):
+        return header
+    with open(path, 'rb') as f:
+        # The header comes before the first task
+        for task in snapshot_reader(f, os.path.getsize(path), header).tasks():
+            break
+    return header
+
+def snapshot_reader(f, size, header):
+    """Return a SnapshotReader or NdjsonReader for a snapshot opened in binary mode"""
+    if decompressor(f).read(len(NDJSON_PREFIX)) == NDJSON_PREFIX:
+        f.seek(0)
+        return NdjsonReader(decompressor(f), f, size, header)
+    f.seek(0)
+    return SnapshotReader(io.TextIOWrapper(decompressor(f), encoding="utf-8"), size, header)
+
+def compressor(f, compression):
+    """Wrap a binary file for writing with the given compression"""
+    if compression == "gzip":
+        # Level 1 is several times faster than the default for about the same
+        # size on task files
+        return gzip.GzipFile(fileobj=f, mode='wb', compresslevel=1)
+    if compression == "zstd":
+        if zstd is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return zstd.ZstdCompressor().stream_writer(f, closefd=False)
+    return f
+
+def decompressor(f):
+    """Wrap a binary file for reading, detecting its compression"""
+    magic = f.read(4)
+    f.seek(0)
+    if magic[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=f, mode='rb')
+    if magic == ZSTD_MAGIC:
+        if zstd is None:
+            raise ValueError("The task file is zstd compressed; install the zstandard package")
+        return io.BufferedReader(zstd.ZstdDecompressor().stream_reader(f, closefd=False))
+    return f
+
+def fsync_dir(path):
+    """Flush a rename to disk by fsyncing the containing directory"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""Stress test for several app instances sharing one task file
+
+Starts worker processes that each open the task file the way the app does
+(a WriteBehindStorage over a JournalStorage with an archive, and a
+TaskStore in memory), hammer it with random adds, edits, completions,
+deletes, clears of the completed tasks and moves to the archive, and merge
+each other's changes as they go. Compaction runs every few records so
+journals are rotated under the other workers' feet.
+
+Once every worker is done, each one's tasks must equal a fresh load of the
+file, and the file must hold exactly the tasks added minus the ones deleted,
+cleared or archived.
+
+    python stress.py --processes 4 --ops 1000
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from archive import TaskArchive
+from storage import JournalStorage, WriteBehindStorage
+from task import PRIORITIES, Task, now_timestamp, today
+from taskstore import TaskStore
+
+def merge(storage, store):
+    """Apply the changes of the other workers; return the store, replaced after a reload"""
+    changes = storage.poll_changes()
+    if changes is None:
+        return store
+    records, reload = changes
+    if reload:
+        while storage.saving():
+            time.sleep(0.01)
+        fresh = open_storage(storage.storage.path)
+        store = TaskStore([Task.from_dict(data) for data in fresh.iter_load()], today())
+        fresh.close()
+        return store
+    for record in records:
+        store.apply(record)
+    return store
+
+def open_storage(path, compact_every=1000):
+    return JournalStorage(path, compact_every=compact_every, archive=TaskArchive(path + ".archive"))
+
+def worker(number, path, ops, compact_every, seed, barrier, results):
+    rng = random.Random(seed + number)
+    storage = WriteBehindStorage(open_storage(path, compact_every))
+    store = TaskStore([Task.from_dict(data) for data in storage.iter_load()], today())
+    next_id = limit = 0
+    mine = []       # tasks added here; only their creator deletes them
+    added, deleted, removed = set(), set(), set()   # ids; removed by clears and archiving
+    started = time.perf_counter()
+    
+    for step in range(ops):
+        action = rng.random()
+        if action < 0.4 or not mine or not len(store):
+            if next_id >= limit:
+                next_id = storage.reserve_ids(10)
+                limit = next_id + 10
+            task = Task(next_id, f"worker {number} task {step}", rng.choice(PRIORITIES),
+                        today() + rng.randint(-5, 5), now_timestamp())
+            next_id += 1
+            store.add(task)
+            op = {"op": "add", "task": task.to_dict()}
+            mine.append(task.id)
+            added.add(task.id)
+        elif action < 0.7:
+            # Any worker's task, so edits of the same task race
+            task = store[rng.randrange(len(store))]
+            store.update(task.id, {"description": f"edited by {number} at {step}",
+                                   "priority": rng.choice(PRIORITIES)})
+            op = {"op": "update", "id": task.id, "fields": {"description": task.description,
+                                                             "priority": task.priority}}
+        elif action < 0.82:
+            task = store[rng.randrange(len(store))]
+            if task.completed:
+                # Like the app, which only completes pending tasks
+                continue
+            completed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+            store.complete(task.id, completed_at)
+            op = {"op": "complete", "id": task.id, "completed_at": completed_at}
+        elif action < 0.85:
+            # Completed tasks of every worker, racing their completions
+            ids = store.remove_completed()
+            if not ids:
+                continue
+            op = {"op": "clear_completed", "ids": ids}
+            removed.update(ids)
+        elif action < 0.88:
+            tasks = [task for task in store if task.completed]
+            if not tasks:
+                continue
+            op = {"op": "archive", "ids": store.remove_completed(), "tasks": tasks}
+            removed.update(op["ids"])
+        else:
+            task_id = mine.pop(rng.randrange(len(mine)))
+            if task_id not in store:
+                # Cleared or archived meanwhile
+                continue
+            store.remove(task_id)
+            op = {"op": "delete", "id": task_id}
+            deleted.add(task_id)
+        storage.record(op, lambda: list(store))
+        if step % 10 == 0:
+            store = merge(storage, store)
+    
+    while storage.saving():
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    # Everyone has written everything; pick up the rest
+    barrier.wait(timeout=600)
+    store = merge(storage, store)
+    results.put((number, added, deleted, removed, elapsed, {task.id: task.to_dict() for task in store}))
+    storage.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress test concurrent access to one task file")
+    parser.add_argument("--processes", type=int, default=4, help="number of worker processes")
+    parser.add_argument("--ops", type=int, default=1000, help="mutations per worker")
+    parser.add_argument("--compact-every", type=int, default=50, help="journal records between compactions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the task files for inspection")
+    args = parser.parse_args(argv)
+    
+    directory = tempfile.mkdtemp(prefix="tasks-stress-")
+    path = os.path.join(directory, "tasks.json")
+    barrier = multiprocessing.Barrier(args.processes)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=worker, args=(number, path, args.ops, args.compact_every,
+                                                            args.seed, barrier, results))
+               for number in range(args.processes)]
+    for process in workers:
+        process.start()
+    reports = []
+    while len(reports) < len(workers):
+        try:
+            reports.append(results.get(timeout=1))
+        except queue.Empty:
+            # A worker that died would leave the others waiting forever
+            if any(process.exitcode not in (None, 0) for process in workers):
+                for process in workers:
+                    process.terminate()
+                print("FAILED: a worker crashed")
+                return 1
+    for process in workers:
+        process.join()
+    
+    storage = open_storage(path)
+    final = {data["id"]: Task.from_dict(data).to_dict() for data in storage.iter_load()}
+    storage.close()
+    # A task may be removed by more than one worker
+    gone = set().union(*(deleted | removed for number, added, deleted, removed, elapsed, tasks in reports))
+    expected = len(set().union(*(added for number, added, deleted, removed, elapsed, tasks in reports)) - gone)
+    failures = []
+    if len(final) != expected:
+        failures.append(f"the file holds {len(final)} tasks, expected {expected}")
+    for number, added, deleted, removed, elapsed, tasks in sorted(reports, key=lambda report: report[0]):
+        ops_per_second = args.ops / elapsed if elapsed else 0.0
+        print(f"worker {number}: {len(added)} added, {len(deleted)} deleted, {len(removed)} cleared or archived, "
+              f"{ops_per_second:.0f} ops/s")
+        if tasks != final:
+            differing = [task_id for task_id in set(tasks) | set(final) if tasks.get(task_id) != final.get(task_id)]
+            failures.append(f"worker {number} differs from the file in {len(differing)} tasks, "
+                            f"e.g. {sorted(differing, key=str)[:5]}")
+    
+    if args.keep:
+        print(f"Task files kept in {directory}")
+    else:
+        shutil.rmtree(directory)
+    if failures:
+        for failure in failures:
+            print(f"FAILED: {failure}")
+        return 1
+    print(f"OK: {len(final)} tasks, {args.processes} workers agree with the file")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
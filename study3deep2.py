@@ -1,17 +1,48 @@
-import json
-import os
-from datetime import datetime
+import argparse
+import queue
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from tkinter.font import Font
+from loader import TaskLoader
+from scheduler import RefreshScheduler
+import config
+from archive import WithArchive
+from engine import TaskEngine, smart_stats_text, stats_text
+from importer import ImportSource
+from instrument import tracer, traced
+from storage import WriteBehindStorage
+from task import format_day, parse_day, seconds_to_midnight, set_timezone, today
+from viewmodel import TreeViewModel, VirtualTreeViewModel
 
 class ProductivityApp:
-    def __init__(self, root):
+    def __init__(self, root, settings=None):
         self.root = root
         self.root.title("Productivity App")
         self.root.geometry("1000x600")
-        self.data_file = "tasks.json"
-        self.tasks = self.load_tasks()
+        self.settings = settings or config.load_config()
+        self.data_file = self.settings["data_file"]
+        # Writes happen on a worker thread, off the event loop
+        self.storage = WriteBehindStorage(config.open_storage(self.settings))
+        # Completed tasks moved out of memory, shown below the others
+        self.archive = self.storage.archive
+        self.archived = len(self.archive) if self.archive is not None else 0
+        self.save_poll = None
+        self.save_failed = False
+        try:
+            set_timezone(self.settings.get("timezone"))
+        except ValueError as e:
+            print(f"Error setting time zone: {e}")
+        self.today = today()
+        # Tasks arrive in batches from a background loader once the window is up
+        self.engine = TaskEngine(self.storage, self.today, on_save=self.show_saving)
+        self.tasks = self.engine.tasks
+        self.filtered = None    # tasks matching the search, None when not searching
+        self.reloader = None
+        self.loading = True
+        self.load_error = None
+        self.importer = None
+        self.import_ops = []
         
         # Default opacity (1.0 = fully opaque, 0.0 = fully transparent)
         self.opacity = 1.0
@@ -54,16 +85,56 @@ class ProductivityApp:
         self.stats_label = ttk.Label(self.task_frame, text="")
         self.stats_label.grid(row=3, column=0, sticky="w", pady=5)
         
+        # Save status, shares the row with the stats
+        self.save_label = ttk.Label(self.task_frame, text="")
+        self.save_label.grid(row=3, column=0, sticky="e", pady=5)
+        
         # Opacity control (added to the bottom right)
         self.create_opacity_control()
         
-        self.update_stats()
-        self.update_smart_view()
+        # Redraws are coalesced into one pass per event loop turn
+        self.refresh = RefreshScheduler(self.root, before_flush=self.update_today)
+        self.refresh.register("task_list", self.refresh_task_list)
+        self.refresh.register("smart_view", self.refresh_smart_view)
+        self.refresh.register("smart_stats", lambda task_ids: self.update_smart_stats())
+        self.refresh.register("stats", lambda task_ids: self.update_stats())
+        self.mark_all_dirty()
+        
+        # Close the journal cleanly when the window is closed
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Overdue and due today move at midnight even without any edits
+        self.schedule_rollover()
+        self.sample_lag()
+        
+        self.load_tasks()
+    
+    def on_close(self):
+        """Flush storage and close the window"""
+        self.save_label.config(text="Saving...")
+        self.storage.close()
+        if self.storage.last_error is not None:
+            messagebox.showerror("Error", f"Some changes could not be saved: {self.storage.last_error}")
+        self.root.destroy()
     
     def create_menu_bar(self):
         """Create the menu bar with opacity controls"""
         menubar = tk.Menu(self.root)
         
+        # Tasks menu; the actions apply to every selected task
+        tasks_menu = tk.Menu(menubar, tearoff=0)
+        tasks_menu.add_command(label="Complete Selected", command=self.complete_task)
+        tasks_menu.add_command(label="Delete Selected", command=self.delete_task)
+        priority_menu = tk.Menu(tasks_menu, tearoff=0)
+        for priority in ("high", "medium", "low"):
+            priority_menu.add_command(label=priority.capitalize(), command=lambda p=priority: self.set_priority(p))
+        tasks_menu.add_cascade(label="Set Priority", menu=priority_menu)
+        tasks_menu.add_command(label="Reschedule Selected...", command=self.reschedule_tasks)
+        tasks_menu.add_separator()
+        tasks_menu.add_command(label="Archive Completed", command=self.archive_completed)
+        tasks_menu.add_command(label="Import...", command=self.import_tasks)
+        menubar.add_cascade(label="Tasks", menu=tasks_menu)
+        
         # View menu with opacity presets
         view_menu = tk.Menu(menubar, tearoff=0)
         view_menu.add_command(label="Full Opacity (100%)", command=lambda: self.set_opacity(1.0))
@@ -72,6 +143,14 @@ class ProductivityApp:
         view_menu.add_command(label="Low Opacity (40%)", command=lambda: self.set_opacity(0.4))
         view_menu.add_separator()
         view_menu.add_command(label="Custom Opacity...", command=self.show_custom_opacity_dialog)
+        
+        # Performance instrumentation
+        self.overlay_var = tk.BooleanVar(value=False)
+        self.profile_var = tk.BooleanVar(value=False)
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="Performance Overlay", variable=self.overlay_var, command=self.toggle_overlay)
+        view_menu.add_checkbutton(label="Profile (cProfile)", variable=self.profile_var, command=self.toggle_profile)
+        view_menu.add_command(label="Export Traces...", command=self.export_traces)
         menubar.add_cascade(label="View", menu=view_menu)
         
         self.root.config(menu=menubar)
@@ -94,6 +173,69 @@ class ProductivityApp:
         
         self.opacity_label = ttk.Label(opacity_frame, text=f"{int(self.opacity*100)}%")
         self.opacity_label.pack(side="left", padx=5)
+        
+        # Performance overlay, left of the opacity control; shown from the View menu
+        self.overlay_label = ttk.Label(self.side_frame, text="", font=("Courier", 8), justify="left")
+    
+    OVERLAY_REFRESH_MS = 500
+    LAG_INTERVAL_MS = 100
+    
+    def sample_lag(self, expected=None):
+        """Measure how late the event loop runs a scheduled callback"""
+        now = time.perf_counter()
+        if expected is not None:
+            tracer.sample_lag(max(0.0, now - expected))
+        self.root.after(self.LAG_INTERVAL_MS, self.sample_lag, now + self.LAG_INTERVAL_MS / 1000)
+    
+    def toggle_overlay(self):
+        """Show or hide the performance overlay"""
+        if self.overlay_var.get():
+            self.overlay_label.grid(row=2, column=0, sticky="sw", pady=5)
+            self.update_overlay()
+        else:
+            self.overlay_label.grid_remove()
+    
+    def update_overlay(self):
+        """Show the latest span latencies, event loop lag and row counters"""
+        if not self.overlay_var.get():
+            return
+        lines = [f"{name[:22]:<22} {last * 1000:7.2f} ms  max {worst * 1000:7.2f}"
+                 for name, (last, worst) in sorted(tracer.recent().items())]
+        lag, worst_lag = tracer.recent_lag()
+        lines.append(f"{'event loop lag':<22} {lag * 1000:7.2f} ms  max {worst_lag * 1000:7.2f}")
+        counters = tracer.counters
+        lines.append("rows +{} -{} ~{} moved {}".format(
+            counters.get("rows inserted", 0), counters.get("rows deleted", 0),
+            counters.get("rows updated", 0), counters.get("rows moved", 0)))
+        self.overlay_label.config(text="\n".join(lines))
+        self.root.after(self.OVERLAY_REFRESH_MS, self.update_overlay)
+    
+    def toggle_profile(self):
+        """Start cProfile, or stop it and save the profile"""
+        if self.profile_var.get():
+            tracer.start_profile()
+            return
+        path = filedialog.asksaveasfilename(title="Save Profile", defaultextension=".prof",
+                                            initialfile="productivity.prof")
+        if not path:
+            # Keep profiling until the profile is saved
+            self.profile_var.set(True)
+            return
+        try:
+            tracer.stop_profile(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save profile: {e}")
+    
+    def export_traces(self):
+        """Save the recorded spans and lag samples as a Chrome trace file"""
+        path = filedialog.asksaveasfilename(title="Export Traces", defaultextension=".json",
+                                            initialfile="productivity-trace.json")
+        if not path:
+            return
+        try:
+            tracer.export(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not export traces: {e}")
     
     def on_opacity_change(self, value):
         """Handle opacity slider changes"""
@@ -168,7 +310,7 @@ class ProductivityApp:
         ttk.Label(entry_frame, text="Due Date:").grid(row=2, column=0, sticky="w")
         self.due_entry = ttk.Entry(entry_frame)
         self.due_entry.grid(row=2, column=1, sticky="ew", padx=5)
-        self.due_entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
+        self.due_entry.insert(0, format_day(today()))
         
         # Add button
         add_btn = ttk.Button(entry_frame, text="Add Task", command=self.add_task)
@@ -179,7 +321,10 @@ class ProductivityApp:
         list_frame = ttk.Frame(self.task_frame)
         list_frame.grid(row=1, column=0, sticky="nsew", pady=5)
         list_frame.grid_columnconfigure(0, weight=1)
-        list_frame.grid_rowconfigure(0, weight=1)
+        list_frame.grid_rowconfigure(1, weight=1)
+        
+        # Search box and filters above the list
+        self.create_search_bar(list_frame)
         
         # Create Treeview with scrollbar
         self.tree = ttk.Treeview(list_frame, columns=("id", "description", "priority", "due_date", "created_at", "completed"), show="headings")
@@ -200,13 +345,12 @@ class ProductivityApp:
         self.tree.column("created_at", width=120, anchor="center")
         self.tree.column("completed", width=80, anchor="center")
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Add scrollbar; it is driven by the virtual list rather than the tree
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
         
         # Grid layout
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        scrollbar.grid(row=1, column=1, sticky="ns")
         
         # Action buttons
         btn_frame = ttk.Frame(self.task_frame)
@@ -218,6 +362,42 @@ class ProductivityApp:
         
         # Bind double click to edit
         self.tree.bind("<Double-1>", self.edit_task)
+        
+        # Only the visible window of tasks is materialized as Treeview rows
+        self.task_view = VirtualTreeViewModel(self.tree, scrollbar, self.task_row, self.shown_tasks)
+    
+    def create_search_bar(self, parent):
+        """Create the search box and the priority/status/due date filters"""
+        search_frame = ttk.Frame(parent)
+        search_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        search_frame.grid_columnconfigure(1, weight=1)
+        
+        ttk.Label(search_frame, text="Search:").grid(row=0, column=0, sticky="w")
+        self.search_var = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=self.search_var).grid(row=0, column=1, columnspan=3, sticky="ew", padx=5)
+        self.match_label = ttk.Label(search_frame, text="")
+        self.match_label.grid(row=0, column=4, columnspan=2, sticky="e")
+        
+        # Filters
+        ttk.Label(search_frame, text="Priority:").grid(row=1, column=0, sticky="w")
+        self.priority_filter = tk.StringVar(value="All")
+        ttk.Combobox(search_frame, textvariable=self.priority_filter, values=("All", "High", "Medium", "Low"),
+                     state="readonly", width=8).grid(row=1, column=1, sticky="w", padx=5)
+        ttk.Label(search_frame, text="Status:").grid(row=1, column=2, sticky="w")
+        self.status_filter = tk.StringVar(value="All")
+        ttk.Combobox(search_frame, textvariable=self.status_filter, values=("All", "Pending", "Completed"),
+                     state="readonly", width=10).grid(row=1, column=3, sticky="w", padx=5)
+        ttk.Label(search_frame, text="Due from/to:").grid(row=1, column=4, sticky="w")
+        due_frame = ttk.Frame(search_frame)
+        due_frame.grid(row=1, column=5, sticky="w", padx=5)
+        self.due_from_var = tk.StringVar()
+        self.due_to_var = tk.StringVar()
+        ttk.Entry(due_frame, textvariable=self.due_from_var, width=11).pack(side="left")
+        ttk.Entry(due_frame, textvariable=self.due_to_var, width=11).pack(side="left", padx=(2, 0))
+        
+        # Filter as the user types; the scheduler coalesces the keystrokes
+        for var in (self.search_var, self.priority_filter, self.status_filter, self.due_from_var, self.due_to_var):
+            var.trace_add("write", lambda *args: self.search_changed())
     
     def create_smart_view(self):
         """Create the smart view panel"""
@@ -247,136 +427,412 @@ class ProductivityApp:
         
         self.smart_stats_label = ttk.Label(stats_frame, text="", font=self.title_font)
         self.smart_stats_label.pack(side="left")
+        
+        # Rows follow the store's score ordering so a change only repositions one row
+        self.smart_view = TreeViewModel(self.smart_tree, self.smart_row)
     
     def load_tasks(self):
-        """Load tasks from JSON file"""
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                tasks = json.load(f)
-                # Convert string dates to datetime objects for sorting
-                for task in tasks:
-                    if 'created_at' in task:
-                        try:
-                            task['created_at_dt'] = datetime.strptime(task['created_at'], "%Y-%m-%d %H:%M:%S")
-                        except ValueError:
-                            task['created_at_dt'] = datetime.now()
-                    if 'due_date' in task and task['due_date']:
-                        try:
-                            task['due_date_dt'] = datetime.strptime(task['due_date'], "%Y-%m-%d")
-                        except ValueError:
-                            task['due_date'] = ""
-                return tasks
-        return []
-    
-    def save_tasks(self):
-        """Save tasks to JSON file"""
-        # Remove datetime objects before saving
-        save_tasks = []
-        for task in self.tasks:
-            save_task = task.copy()
-            if 'created_at_dt' in save_task:
-                del save_task['created_at_dt']
-            if 'due_date_dt' in save_task:
-                del save_task['due_date_dt']
-            save_tasks.append(save_task)
-        
-        with open(self.data_file, 'w') as f:
-            json.dump(save_tasks, f, indent=2)
+        """Start streaming tasks from the snapshot and journal"""
+        self.loader = TaskLoader(self.storage)
+        self.loader.start()
+        self.root.after(self.LOAD_POLL_MS, self.poll_loader)
+    
+    # How often the loader queue is drained and how long each drain may take
+    LOAD_POLL_MS = 20
+    LOAD_BUDGET = 0.03
+    
+    @traced()
+    def poll_loader(self):
+        """Move loaded batches into the store without blocking the event loop"""
+        deadline = time.perf_counter() + self.LOAD_BUDGET
+        added = False
+        while time.perf_counter() < deadline:
+            batch = self.loader.poll()
+            if batch is False:
+                break
+            if isinstance(batch, Exception):
+                self.fail_loading(batch)
+                return
+            if batch is None:
+                self.finish_loading()
+                return
+            # The smart ordering is sorted once, by engine.loaded()
+            self.tasks.extend(batch, smart=False)
+            added = True
+        
+        if added:
+            self.refresh.mark("task_list")
+        self.stats_label.config(text=f"Loading tasks... {int(self.loader.progress * 100)}% ({len(self.tasks)} loaded)")
+        self.root.after(self.LOAD_POLL_MS, self.poll_loader)
+    
+    @traced()
+    def finish_loading(self):
+        """Enable editing once every task has been loaded"""
+        self.loading = False
+        self.engine.loaded()
+        self.mark_all_dirty()
+        self.root.after(self.LOAD_POLL_MS, self.build_search_index)
+        self.root.after(self.WATCH_MS, self.watch_file)
+    
+    # Tasks indexed for search per event loop turn once loading is done
+    INDEX_CHUNK = 2000
+    
+    @traced()
+    def build_search_index(self):
+        """Index the loaded descriptions in slices; a search finishes the rest at once"""
+        if self.tasks.index_some(self.INDEX_CHUNK):
+            self.root.after(self.LOAD_POLL_MS, self.build_search_index)
+    
+    def fail_loading(self, error):
+        """Keep the app read-only after a failed load so the file is not overwritten"""
+        self.load_error = error
+        print(f"Error loading tasks: {error}")
+        self.refresh.mark("task_list")
+        self.refresh.mark("smart_view")
+        self.refresh.flush()
+        self.stats_label.config(text=f"Could not load tasks ({len(self.tasks)} shown, read-only)")
+        messagebox.showerror("Error", f"Could not load tasks: {error}")
+    
+    def can_edit(self):
+        """Return True when tasks may be changed, warning the user otherwise"""
+        if self.load_error is not None:
+            messagebox.showerror("Error", "Tasks could not be loaded; changes are disabled")
+            return False
+        if self.loading:
+            messagebox.showwarning("Warning", "Tasks are still loading, please wait")
+            return False
+        if self.importer is not None:
+            messagebox.showwarning("Warning", "Tasks are being imported, please wait")
+            return False
+        if self.reloader is not None:
+            messagebox.showwarning("Warning", "Tasks are being reloaded, please wait")
+            return False
+        return True
     
+    # How often the task file is checked for changes made by other instances
+    WATCH_MS = 500
+    
+    def watch_file(self):
+        """Merge the changes other instances wrote to the task file"""
+        self.root.after(self.WATCH_MS, self.watch_file)
+        if self.load_error is not None or self.importer is not None or self.reloader is not None:
+            return
+        changes = self.storage.poll_changes()
+        if self.archive is not None and len(self.archive) != self.archived:
+            self.archived = len(self.archive)
+            self.refresh.mark("task_list")
+            self.refresh.mark("stats")
+        if changes is None:
+            return
+        records, reload = changes
+        if reload:
+            self.reload_tasks()
+            return
+        with tracer.span("merge changes"):
+            changed = set()
+            for record in records:
+                changed.update(self.tasks.apply(record))
+        removed = [task_id for task_id in changed if task_id not in self.tasks]
+        self.task_view.forget(*removed)
+        self.tasks_changed(*changed)
+    
+    def reload_tasks(self):
+        """Read the task file again after another instance compacted records we missed"""
+        # Edits stay disabled from here on; queued records have to be in the
+        # file before it is read
+        self.reloader = False
+        if self.storage.saving():
+            self.root.after(self.SAVE_POLL_MS, self.reload_tasks)
+            return
+        self.reloader = TaskLoader(config.open_storage(self.settings))
+        self.reloader.start()
+        self.reloaded = []
+        self.root.after(self.LOAD_POLL_MS, self.poll_reload)
+    
+    def poll_reload(self):
+        """Collect the reloaded tasks, then merge them into the store"""
+        while True:
+            batch = self.reloader.poll()
+            if batch is False:
+                self.root.after(self.LOAD_POLL_MS, self.poll_reload)
+                return
+            if batch is None or isinstance(batch, Exception):
+                break
+            self.reloaded.extend(batch)
+        self.reloader.storage.close()
+        self.reloader = None
+        if batch is not None:
+            print(f"Error reloading tasks: {batch}")
+            return
+        
+        loaded = {task.id: task for task in self.reloaded}
+        self.reloaded = []
+        removed = [task.id for task in self.tasks if task.id not in loaded]
+        self.tasks.remove_many(removed)
+        self.task_view.forget(*removed)
+        for task_id, task in loaded.items():
+            if task_id in self.tasks:
+                self.tasks.replace(task_id, task)
+            else:
+                self.tasks.add(task)
+        self.mark_all_dirty()
+    
+    def show_saving(self):
+        """Show that a record was queued for the background journal writer"""
+        self.save_label.config(text="Saving...")
+        if self.save_poll is None:
+            self.save_poll = self.root.after(self.SAVE_POLL_MS, self.poll_saves)
+    
+    SAVE_POLL_MS = 100
+    
+    @traced()
+    def poll_saves(self):
+        """Report the outcome of background writes on the UI thread"""
+        self.save_poll = None
+        failed = None
+        while True:
+            try:
+                state, error = self.storage.events.get_nowait()
+            except queue.Empty:
+                break
+            failed = error if state == "failed" else None
+        
+        if self.archive is not None and len(self.archive) != self.archived:
+            # Archived tasks reappear below the list once they are written
+            self.archived = len(self.archive)
+            self.refresh.mark("task_list")
+            self.refresh.mark("stats")
+        
+        if failed is not None and not self.save_failed:
+            # Report once; the writer keeps retrying in the background
+            self.save_failed = True
+            messagebox.showerror("Error", f"Could not save tasks: {failed}")
+        
+        if self.storage.saving():
+            text = "Save failed, retrying..." if self.save_failed else "Saving..."
+            self.save_poll = self.root.after(self.SAVE_POLL_MS, self.poll_saves)
+        else:
+            self.save_failed = False
+            text = "Saved"
+        self.save_label.config(text=text)
+    
+    @traced()
     def add_task(self):
         """Add a new task"""
+        if not self.can_edit():
+            return
         description = self.desc_entry.get().strip()
         if not description:
             messagebox.showerror("Error", "Task description cannot be empty")
             return
         
-        task = {
-            "id": len(self.tasks) + 1,
-            "description": description,
-            "priority": self.priority_var.get(),
-            "due_date": self.due_entry.get().strip(),
-            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "created_at_dt": datetime.now(),
-            "completed": False
-        }
-        
-        if task["due_date"]:
+        due_date = self.due_entry.get().strip()
+        due = None
+        if due_date:
             try:
-                task["due_date_dt"] = datetime.strptime(task["due_date"], "%Y-%m-%d")
+                due = parse_day(due_date)
             except ValueError:
                 messagebox.showerror("Error", "Invalid date format. Use YYYY-MM-DD")
                 return
         
-        self.tasks.append(task)
-        self.save_tasks()
-        self.update_task_list()
-        self.update_smart_view()
-        self.update_stats()
+        task = self.engine.add(description, self.priority_var.get(), due)
+        self.tasks_changed(task.id)
         
         # Clear entry fields
         self.desc_entry.delete(0, tk.END)
         self.due_entry.delete(0, tk.END)
-        self.due_entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
+        self.due_entry.insert(0, format_day(today()))
     
+    def selected_tasks(self, action, confirm=True):
+        """Return the ids of the selected tasks, warning when there are none
+        
+        When several tasks are selected the user confirms their number first,
+        since some of them may be scrolled out of view.
+        """
+        selected = [task_id for task_id in self.task_view.selection() if task_id in self.tasks]
+        if not selected:
+            messagebox.showwarning("Warning", f"Please select a task to {action}")
+        elif confirm and len(selected) > 1:
+            if not messagebox.askyesno("Confirm", f"{action.capitalize()} {len(selected)} selected tasks?"):
+                return []
+        return selected
+    
+    @traced()
     def complete_task(self):
-        """Mark selected task as completed"""
-        selected = self.tree.selection()
+        """Mark the selected tasks as completed"""
+        if not self.can_edit():
+            return
+        selected = self.selected_tasks("complete")
         if not selected:
-            messagebox.showwarning("Warning", "Please select a task to complete")
             return
         
-        item = self.tree.item(selected[0])
-        task_id = item['values'][0]
-        
-        for task in self.tasks:
-            if task["id"] == task_id:
-                task["completed"] = True
-                task["completed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.save_tasks()
-                self.update_task_list()
-                self.update_smart_view()
-                self.update_stats()
-                break
+        completed = self.engine.complete(selected)
+        self.tasks_changed(*completed, rows_moved=False)
     
+    @traced()
     def delete_task(self):
-        """Delete selected task"""
-        selected = self.tree.selection()
+        """Delete the selected tasks"""
+        if not self.can_edit():
+            return
+        selected = self.selected_tasks("delete")
         if not selected:
-            messagebox.showwarning("Warning", "Please select a task to delete")
             return
         
-        item = self.tree.item(selected[0])
-        task_id = item['values'][0]
+        self.engine.delete(selected)
+        self.task_view.forget(*selected)
+        self.tasks_changed(*selected)
+    
+    def set_priority(self, priority):
+        """Give the selected tasks a new priority"""
+        self.update_selected({"priority": priority})
+    
+    def reschedule_tasks(self):
+        """Ask for a new due date for the selected tasks"""
+        if not self.can_edit() or not self.selected_tasks("reschedule", confirm=False):
+            return
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Reschedule Tasks")
+        dialog.transient(self.root)
+        dialog.grab_set()
         
-        self.tasks = [task for task in self.tasks if task["id"] != task_id]
-        self.save_tasks()
-        self.update_task_list()
-        self.update_smart_view()
-        self.update_stats()
+        ttk.Label(dialog, text="New due date (YYYY-MM-DD, empty for none):").pack(padx=10, pady=5)
+        entry = ttk.Entry(dialog)
+        entry.pack(padx=10, pady=5)
+        entry.insert(0, format_day(today()))
+        
+        def apply_due_date():
+            text = entry.get().strip()
+            due = None
+            if text:
+                try:
+                    due = parse_day(text)
+                except ValueError:
+                    messagebox.showerror("Error", "Invalid date format. Use YYYY-MM-DD")
+                    return
+            self.update_selected({"due": due})
+            dialog.destroy()
+        
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(padx=10, pady=5)
+        
+        ttk.Button(btn_frame, text="Cancel", command=dialog.destroy).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Apply", command=apply_due_date).pack(side="left", padx=5)
+    
+    @traced()
+    def update_selected(self, fields):
+        """Apply `fields` to every selected task"""
+        if not self.can_edit():
+            return
+        selected = self.selected_tasks("change")
+        if not selected:
+            return
+        
+        self.engine.update(selected, fields)
+        self.tasks_changed(*selected, rows_moved=False)
+    
+    def import_tasks(self):
+        """Import tasks from a CSV or NDJSON file in the background"""
+        if not self.can_edit():
+            return
+        path = filedialog.askopenfilename(
+            title="Import Tasks",
+            filetypes=[("CSV and NDJSON files", "*.csv *.ndjson *.jsonl"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        self.importer = TaskLoader(ImportSource(path))
+        self.importer.start()
+        self.root.after(self.LOAD_POLL_MS, self.poll_import)
+    
+    @traced()
+    def poll_import(self):
+        """Add imported batches to the store; the views are redrawn once at the end"""
+        deadline = time.perf_counter() + self.LOAD_BUDGET
+        added = False
+        while time.perf_counter() < deadline:
+            batch = self.importer.poll()
+            if batch is False:
+                break
+            if batch is None or isinstance(batch, Exception):
+                self.finish_import(batch)
+                return
+            ops = self.engine.number(batch)
+            self.tasks.extend(batch, smart=False)
+            self.import_ops.extend(ops)
+            added = True
+        
+        if added:
+            self.refresh.mark("task_list")
+        self.stats_label.config(text=f"Importing tasks... {int(self.importer.progress * 100)}% "
+                                     f"({len(self.import_ops)} imported)")
+        self.root.after(self.LOAD_POLL_MS, self.poll_import)
+    
+    @traced()
+    def finish_import(self, error=None):
+        """Save a completed import as one record, or take a failed one back out"""
+        source = self.importer.storage
+        ops, self.import_ops = self.import_ops, []
+        self.importer = None
+        self.tasks.sort_smart()
+        if error is not None:
+            removed = [op["task"]["id"] for op in ops]
+            self.tasks.remove_many(removed)
+            self.task_view.forget(*removed)
+        else:
+            self.engine.save_many(ops)
+        self.mark_all_dirty()
+        
+        if error is not None:
+            print(f"Error importing tasks: {error}")
+            messagebox.showerror("Error", f"Could not import {source.path}: {error}\nNo tasks were imported")
+            return
+        message = f"Imported {len(ops)} tasks"
+        if source.skipped:
+            message += f", skipped {source.skipped} rows without a description"
+        messagebox.showinfo("Info", message)
     
+    @traced()
     def clear_completed(self):
         """Remove all completed tasks"""
-        initial_count = len(self.tasks)
-        self.tasks = [task for task in self.tasks if not task["completed"]]
-        removed = initial_count - len(self.tasks)
-        self.save_tasks()
-        self.update_task_list()
-        self.update_smart_view()
-        self.update_stats()
+        if not self.can_edit():
+            return
+        removed_ids = self.engine.clear_completed()
+        removed = len(removed_ids)
+        # Completed tasks never appear in the smart view
+        self.task_view.forget(*removed_ids)
+        self.refresh.mark("task_list")
+        self.refresh.mark("stats")
         messagebox.showinfo("Info", f"Removed {removed} completed tasks")
     
-    def edit_task(self, event):
-        """Edit task on double click"""
-        selected = self.tree.selection()
-        if not selected:
+    @traced()
+    def archive_completed(self):
+        """Move all completed tasks to the read-only archive"""
+        if not self.can_edit():
+            return
+        if self.archive is None:
+            messagebox.showerror("Error", "Archiving needs the journal backend with an archive file")
+            return
+        tasks = self.engine.archive_completed()
+        if not tasks:
+            messagebox.showinfo("Info", "There are no completed tasks to archive")
             return
         
-        item = self.tree.item(selected[0])
-        task_id = item['values'][0]
+        self.task_view.forget(*(task.id for task in tasks))
+        self.refresh.mark("task_list")
+        self.refresh.mark("stats")
+        messagebox.showinfo("Info", f"Archived {len(tasks)} completed tasks")
+    
+    def edit_task(self, event):
+        """Edit the task of the double-clicked row"""
+        # The selection may also hold tasks scrolled out of view
+        task_id = self.task_view.task_id(self.tree.identify_row(event.y))
+        if task_id is None or not self.can_edit():
+            return
         
         # Find the task
-        task = next((t for t in self.tasks if t["id"] == task_id), None)
+        task = self.tasks.get(task_id)
         if not task:
+            messagebox.showinfo("Info", "Archived tasks are read-only")
             return
         
         # Create edit dialog
@@ -389,11 +845,11 @@ class ProductivityApp:
         ttk.Label(edit_dialog, text="Description:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
         desc_entry = ttk.Entry(edit_dialog)
         desc_entry.grid(row=0, column=1, sticky="ew", padx=5, pady=5)
-        desc_entry.insert(0, task["description"])
+        desc_entry.insert(0, task.description)
         
         # Priority
         ttk.Label(edit_dialog, text="Priority:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
-        priority_var = tk.StringVar(value=task["priority"])
+        priority_var = tk.StringVar(value=task.priority)
         priority_frame = ttk.Frame(edit_dialog)
         priority_frame.grid(row=1, column=1, sticky="w", padx=5, pady=5)
         ttk.Radiobutton(priority_frame, text="High", variable=priority_var, value="high").pack(side="left")
@@ -404,133 +860,211 @@ class ProductivityApp:
         ttk.Label(edit_dialog, text="Due Date:").grid(row=2, column=0, sticky="w", padx=5, pady=5)
         due_entry = ttk.Entry(edit_dialog)
         due_entry.grid(row=2, column=1, sticky="ew", padx=5, pady=5)
-        due_entry.insert(0, task["due_date"] if task["due_date"] else "")
+        due_entry.insert(0, task.due_date)
         
         # Save button
+        @traced("edit_task")
         def save_changes():
-            task["description"] = desc_entry.get().strip()
-            task["priority"] = priority_var.get()
-            
+            if task_id not in self.tasks:
+                messagebox.showerror("Error", "The task was deleted by another instance of the app")
+                edit_dialog.destroy()
+                return
             new_due_date = due_entry.get().strip()
+            due = None
             if new_due_date:
                 try:
-                    task["due_date_dt"] = datetime.strptime(new_due_date, "%Y-%m-%d")
-                    task["due_date"] = new_due_date
+                    due = parse_day(new_due_date)
                 except ValueError:
                     messagebox.showerror("Error", "Invalid date format. Use YYYY-MM-DD")
                     return
-            else:
-                task["due_date"] = ""
-                if "due_date_dt" in task:
-                    del task["due_date_dt"]
             
-            self.save_tasks()
-            self.update_task_list()
-            self.update_smart_view()
+            self.engine.update([task_id], {
+                "description": desc_entry.get().strip(),
+                "priority": priority_var.get(),
+                "due": due
+            })
+            # Totals do not change, so the main stats label is left alone
+            self.refresh.mark("task_list", task_id)
+            self.refresh.mark("smart_view", task_id)
+            self.refresh.mark("smart_stats")
             edit_dialog.destroy()
         
         ttk.Button(edit_dialog, text="Save", command=save_changes).grid(row=3, column=1, sticky="e", padx=5, pady=5)
     
+    def task_row(self, task):
+        """Return the main list row values for a task"""
+        completed = "Yes" if task.completed else "No"
+        return (
+            task.id,
+            task.description,
+            task.priority.capitalize(),
+            task.due_date if task.due is not None else "-",
+            task.created_at,
+            completed
+        )
+    
+    def smart_row(self, task):
+        """Return the smart view row values for a task"""
+        return (
+            task.description,
+            task.priority.capitalize(),
+            task.due_date if task.due is not None else "-"
+        )
+    
+    def shown_tasks(self):
+        """Return the tasks the main list shows: all of them, or the search results
+        
+        Archived tasks follow the others but are not searched.
+        """
+        if self.filtered is not None:
+            return self.filtered
+        if self.archived:
+            return WithArchive(self.tasks, self.archive)
+        return self.tasks
+    
+    def search_changed(self):
+        """Show the results of the new search from the top"""
+        # Selected tasks could drop out of the results unseen
+        self.task_view.clear_selection()
+        self.task_view.first = 0
+        self.refresh.mark("task_list")
+    
+    def search_filters(self):
+        """Return the search arguments for TaskStore.search, or None when not searching"""
+        filters = {"query": self.search_var.get()}
+        priority = self.priority_filter.get()
+        if priority != "All":
+            filters["priority"] = priority.lower()
+        status = self.status_filter.get()
+        if status != "All":
+            filters["completed"] = status == "Completed"
+        # Half typed dates are ignored until they parse
+        for name, var in (("due_from", self.due_from_var), ("due_to", self.due_to_var)):
+            text = var.get().strip()
+            if text:
+                try:
+                    filters[name] = parse_day(text)
+                except ValueError:
+                    pass
+        if not filters["query"].strip() and len(filters) == 1:
+            return None
+        return filters
+    
+    @traced()
     def update_task_list(self):
         """Update the main task list"""
-        # Clear current items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Add tasks to the treeview
-        for task in self.tasks:
-            completed = "Yes" if task["completed"] else "No"
-            self.tree.insert("", "end", values=(
-                task["id"],
-                task["description"],
-                task["priority"].capitalize(),
-                task["due_date"] if task["due_date"] else "-",
-                task["created_at"],
-                completed
-            ))
+        filters = self.search_filters()
+        if filters is None:
+            self.filtered = None
+            self.match_label.config(text="")
+        else:
+            self.filtered = self.tasks.search(**filters)
+            self.match_label.config(text=f"{len(self.filtered)} of {len(self.tasks)} tasks")
+        self.task_view.refresh()
     
+    @traced()
     def update_smart_view(self):
         """Update the smart view with weighted sorting"""
-        # Clear current items
-        for item in self.smart_tree.get_children():
-            self.smart_tree.delete(item)
-        
-        # Filter out completed tasks
-        pending_tasks = [task for task in self.tasks if not task["completed"]]
-        
-        if not pending_tasks:
-            self.smart_stats_label.config(text="No pending tasks")
+        # The store keeps pending tasks ordered by score
+        self.smart_view.sync(self.tasks.smart_tasks())
+    
+    def schedule_rollover(self):
+        """Re-score the smart view shortly after the next local midnight"""
+        delay = seconds_to_midnight() + 1
+        self.root.after(int(delay * 1000), self.on_rollover)
+    
+    def on_rollover(self):
+        """Move overdue/due today counts and scores over to the new day"""
+        # The flush notices the new day, see update_today
+        self.refresh.mark("smart_stats")
+        self.schedule_rollover()
+    
+    def update_today(self):
+        """Read the date once per refresh pass, re-scoring when it changed"""
+        day = today()
+        if day != self.today:
+            self.today = day
+            self.tasks.set_today(day)
+            self.refresh.mark("smart_view")
+            self.refresh.mark("smart_stats")
+    
+    def mark_all_dirty(self):
+        """Schedule a refresh of every view"""
+        for name in self.refresh.views:
+            self.refresh.mark(name)
+    
+    def tasks_changed(self, *task_ids, rows_moved=True):
+        """Schedule the redraws after tasks were added, changed or removed
+        
+        Adding or removing tasks shifts the rows of the main list; otherwise
+        only the rows of the changed tasks need to be redrawn.
+        """
+        if rows_moved:
+            self.refresh.mark("task_list")
+        else:
+            self.refresh.mark("task_list", *task_ids)
+        self.refresh.mark("smart_view", *task_ids)
+        self.refresh.mark("smart_stats")
+        self.refresh.mark("stats")
+    
+    def refresh_task_list(self, task_ids):
+        """Redraw the whole task list window, or just the rows of `task_ids`"""
+        # A change can move a task in or out of the search results
+        if task_ids is None or self.filtered is not None:
+            self.update_task_list()
             return
-        
-        # Calculate weights for sorting
-        today = datetime.now().date()
-        
-        for task in pending_tasks:
-            # Priority weight (50%)
-            if task["priority"] == "high":
-                priority_weight = 3
-            elif task["priority"] == "medium":
-                priority_weight = 2
-            else:
-                priority_weight = 1
-            
-            # Due date weight (25%)
-            if "due_date_dt" in task:
-                days_until_due = (task["due_date_dt"].date() - today).days
-                if days_until_due < 0:  # Overdue
-                    due_weight = 3
-                elif days_until_due == 0:  # Due today
-                    due_weight = 2
-                else:  # Future due date
-                    due_weight = 1
+        for task_id in task_ids:
+            task = self.tasks.get(task_id)
+            if task is None:
+                self.update_task_list()
+                return
+            self.task_view.update(task)
+    
+    def refresh_smart_view(self, task_ids):
+        """Re-sync the smart view, or only reposition the tasks in `task_ids`"""
+        if task_ids is None or len(task_ids) > self.SMART_SYNC_LIMIT:
+            # Large bulk changes are cheaper to sync in one pass
+            self.update_smart_view()
+            return
+        if len(task_ids) == 1:
+            self.refresh_smart_task(next(iter(task_ids)))
+            return
+        placed = []
+        for task_id in task_ids:
+            task = self.tasks.get(task_id)
+            if task is None or task.completed:
+                self.smart_view.delete(task_id)
             else:
-                due_weight = 0  # No due date
-            
-            # Creation time weight (25%) - newer tasks get higher priority
-            created_today = task["created_at_dt"].date() == today
-            creation_weight = 1 if created_today else 0
-            
-            # Combined score
-            task["sort_score"] = (
-                0.5 * priority_weight + 
-                0.25 * due_weight + 
-                0.25 * creation_weight
-            )
-        
-        # Sort by the calculated score (descending)
-        pending_tasks.sort(key=lambda x: x["sort_score"], reverse=True)
-        
-        # Add to smart view
-        for task in pending_tasks:
-            self.smart_tree.insert("", "end", values=(
-                task["description"],
-                task["priority"].capitalize(),
-                task["due_date"] if task["due_date"] else "-"
-            ))
-        
-        # Update stats
-        total_pending = len(pending_tasks)
-        overdue = sum(1 for t in pending_tasks if "due_date_dt" in t and t["due_date_dt"].date() < today)
-        due_today = sum(1 for t in pending_tasks if "due_date_dt" in t and t["due_date_dt"].date() == today)
-        
-        stats_text = f"Pending: {total_pending} | Overdue: {overdue} | Due today: {due_today}"
-        self.smart_stats_label.config(text=stats_text)
+                placed.append((self.tasks.smart_position(task_id), task))
+        self.smart_view.place_many(placed)
+    
+    # Past this many changed tasks one sync beats repositioning rows one by one
+    SMART_SYNC_LIMIT = 1000
+    
+    @traced()
+    def refresh_smart_task(self, task_id):
+        """Insert, reposition or drop a single task in the smart view"""
+        task = self.tasks.get(task_id)
+        if task is None or task.completed:
+            self.smart_view.delete(task_id)
+        else:
+            self.smart_view.place(task, self.tasks.smart_position(task_id))
     
+    @traced()
+    def update_smart_stats(self):
+        """Update the pending/overdue/due today counters of the smart view"""
+        self.smart_stats_label.config(text=smart_stats_text(self.tasks.stats))
+    
+    @traced()
     def update_stats(self):
         """Update the statistics display"""
-        total = len(self.tasks)
-        completed = sum(1 for task in self.tasks if task["completed"])
-        pending = total - completed
-        
-        if total > 0:
-            completion_rate = (completed / total) * 100
-            stats_text = f"Total: {total} | Completed: {completed} | Pending: {pending} | Completion: {completion_rate:.1f}%"
-        else:
-            stats_text = "No tasks yet"
-        
-        self.stats_label.config(text=stats_text)
+        # Counters are kept up to date by the store
+        self.stats_label.config(text=stats_text(self.tasks.stats, self.archived))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Productivity App")
+    config.add_arguments(parser)
+    settings = config.apply_arguments(config.load_config(), parser.parse_args())
     root = tk.Tk()
-    app = ProductivityApp(root)
+    app = ProductivityApp(root, settings)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,227 @@
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import time
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+PRIORITIES = ("low", "medium", "high")
+PRIORITY_CODES = {name: code for code, name in enumerate(PRIORITIES)}
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+EPOCH = datetime(1970, 1, 1)
+DAY_SECONDS = 86400
+
+# Due dates repeat heavily, so share one int object per distinct day
+_days = {}
+
+# Time zone that "now" and "today" are taken in; None for the system's
+_zone = None
+
+def set_timezone(name):
+    """Use an IANA time zone such as "Europe/Berlin" for the current date and time
+    
+    An empty name goes back to the system's local time. Stored timestamps
+    are wall-clock times in this zone. Raises ValueError for an unknown zone.
+    """
+    global _zone
+    if not name:
+        _zone = None
+        return
+    if ZoneInfo is None:
+        raise ValueError("Time zones need Python 3.9 or later")
+    try:
+        _zone = ZoneInfo(name)
+    except (KeyError, ValueError) as e:
+        # ZoneInfoNotFoundError is a KeyError
+        raise ValueError(f"Unknown time zone: {name}") from e
+
+def local_now():
+    """Return the current wall-clock time in the configured time zone, naive"""
+    if _zone is None:
+        return datetime.now()
+    return datetime.now(_zone).replace(tzinfo=None)
+
+@lru_cache(maxsize=4096)
+def parse_day(text):
+    """Parse a YYYY-MM-DD string into days since 1970-01-01
+    
+    Results are cached: a large file holds few distinct due dates.
+    """
+    # fromisoformat is much faster than strptime but also accepts other ISO
+    # forms, so only use it on the exact layout the app writes
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        try:
+            parsed = date.fromisoformat(text)
+        except ValueError:
+            parsed = datetime.strptime(text, "%Y-%m-%d")
+    else:
+        parsed = datetime.strptime(text, "%Y-%m-%d")
+    day = parsed.toordinal() - EPOCH_ORDINAL
+    return _days.setdefault(day, day)
+
+def format_day(day):
+    """Format days since 1970-01-01 as YYYY-MM-DD"""
+    return date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+def parse_timestamp(text):
+    """Parse a YYYY-MM-DD HH:MM:SS string into seconds since 1970-01-01"""
+    if len(text) == 19 and text[4] == "-" and text[7] == "-" and text[10] == " ":
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            parsed = datetime.strptime(text, "%Y-%m-%d %H:%M:%S")
+    else:
+        parsed = datetime.strptime(text, "%Y-%m-%d %H:%M:%S")
+    return int((parsed - EPOCH).total_seconds())
+
+def format_timestamp(seconds):
+    """Format seconds since 1970-01-01 as YYYY-MM-DD HH:MM:SS"""
+    return (EPOCH + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+def now_timestamp():
+    """Return the current local time in seconds since 1970-01-01"""
+    return int((local_now() - EPOCH).total_seconds())
+
+def now_text():
+    """Return the current local time as YYYY-MM-DD HH:MM:SS"""
+    return local_now().strftime("%Y-%m-%d %H:%M:%S")
+
+def today():
+    """Return the current local date in days since 1970-01-01"""
+    return local_now().toordinal() - EPOCH_ORDINAL
+
+def seconds_to_midnight():
+    """Return the seconds left until the next local midnight"""
+    midnight = datetime.combine(local_now().date() + timedelta(days=1), datetime.min.time(), tzinfo=_zone)
+    # A naive datetime converts to a timestamp in the system's time zone
+    return midnight.timestamp() - time.time()
+
+class Task:
+    """Compact task record
+    
+    Dates are kept as integers (days or seconds since 1970-01-01) and the
+    priority as a small code; the string forms used by the UI and the JSON
+    files are derived on access. Tasks loaded from a file keep their date
+    strings until the dates are first needed. Unknown keys from the file are
+    kept in `extra` so they survive a round trip.
+    """
+    
+    __slots__ = ("id", "description", "_priority", "_due", "_created", "completed", "completed_at", "extra")
+    
+    def __init__(self, id, description, priority="medium", due=None, created=None,
+                 completed=False, completed_at=None, extra=None):
+        self.id = id
+        self.description = description
+        self.priority = priority
+        self.due = due
+        self.created = created
+        self.completed = completed
+        self.completed_at = completed_at
+        self.extra = extra
+    
+    @property
+    def priority(self):
+        code = self._priority
+        return PRIORITIES[code] if isinstance(code, int) else code
+    
+    @priority.setter
+    def priority(self, value):
+        # Unknown priorities are kept verbatim
+        self._priority = PRIORITY_CODES.get(value, value)
+    
+    @property
+    def due(self):
+        due = self._due
+        if due.__class__ is str:
+            try:
+                due = parse_day(due)
+            except ValueError:
+                due = None
+            self._due = due
+        return due
+    
+    @due.setter
+    def due(self, value):
+        self._due = value
+    
+    @property
+    def created(self):
+        created = self._created
+        if created.__class__ is str:
+            try:
+                created = parse_timestamp(created)
+            except ValueError:
+                created = now_timestamp()
+            self._created = created
+        return created
+    
+    @created.setter
+    def created(self, value):
+        self._created = value
+    
+    @property
+    def priority_weight(self):
+        code = self._priority
+        return code + 1 if isinstance(code, int) else 1
+    
+    @property
+    def due_date(self):
+        due = self.due
+        return format_day(due) if due is not None else ""
+    
+    @property
+    def created_at(self):
+        created = self.created
+        return format_timestamp(created) if created is not None else ""
+    
+    @property
+    def created_day(self):
+        created = self.created
+        return created // DAY_SECONDS if created is not None else None
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build a task from its JSON form
+        
+        The date strings are stored as-is and parsed on first access; dates
+        already given as integers (from NDJSON snapshots) are used directly.
+        """
+        data = dict(data)
+        # Transient key written by older versions of the app
+        data.pop("sort_score", None)
+        created = data.pop("created_at", None)
+        if created is not None and not isinstance(created, (str, int)):
+            created = now_timestamp()
+        due = data.pop("due_date", "")
+        if due == "" or not isinstance(due, (str, int)):
+            due = None
+        return cls(
+            data.pop("id", None),
+            data.pop("description", ""),
+            data.pop("priority", "medium"),
+            due,
+            created,
+            data.pop("completed", False),
+            data.pop("completed_at", None),
+            data or None
+        )
+    
+    def to_dict(self):
+        """Return the JSON form of the task"""
+        data = {
+            "id": self.id,
+            "description": self.description,
+            "priority": self.priority,
+            "due_date": self.due_date
+        }
+        if self.created is not None:
+            data["created_at"] = self.created_at
+        data["completed"] = self.completed
+        if self.completed_at is not None:
+            data["completed_at"] = self.completed_at
+        if self.extra:
+            data.update(self.extra)
+        return data
\ No newline at end of file
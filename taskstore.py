@@ -0,0 +1,428 @@
+import bisect
+from collections import OrderedDict
+import itertools
+
+from scoring import ScoreColumns, numpy_module, smart_points
+from search import SearchIndex, exact_terms, parse_query
+from storage import apply_op
+from task import Task
+
+# Task attributes a journal record can change
+FIELDS = ("description", "priority", "due", "created", "completed", "completed_at", "extra")
+
+class TaskStats:
+    """Running counters behind the stats labels
+    
+    Keeps the total and completed counts and, for pending tasks, a count per
+    due day plus running overdue and due today totals. Counting a task in or
+    out is O(1); only a change of date touches the due day buckets.
+    """
+    
+    def __init__(self, today):
+        self.today = today
+        self.total = 0
+        self.completed = 0
+        self.overdue = 0
+        self.due_counts = {}    # due day -> number of pending tasks due
+    
+    @property
+    def pending(self):
+        return self.total - self.completed
+    
+    @property
+    def due_today(self):
+        return self.due_counts.get(self.today, 0)
+    
+    @property
+    def completion_rate(self):
+        return self.completed / self.total * 100 if self.total else 0.0
+    
+    def count(self, task):
+        """Count a task in"""
+        self.total += 1
+        if task.completed:
+            self.completed += 1
+            return
+        due = task.due
+        if due is not None:
+            self.due_counts[due] = self.due_counts.get(due, 0) + 1
+            if due < self.today:
+                self.overdue += 1
+    
+    def uncount(self, task):
+        """Count a task out, before it changes or is removed"""
+        self.total -= 1
+        if task.completed:
+            self.completed -= 1
+            return
+        due = task.due
+        if due is not None:
+            count = self.due_counts[due] - 1
+            if count:
+                self.due_counts[due] = count
+            else:
+                del self.due_counts[due]
+            if due < self.today:
+                self.overdue -= 1
+    
+    def uncount_completed(self):
+        """Count out every completed task"""
+        self.total -= self.completed
+        self.completed = 0
+    
+    def set_today(self, today):
+        """Recompute the overdue total for a new day"""
+        self.today = today
+        self.overdue = sum(count for day, count in self.due_counts.items() if day < today)
+
+class TaskStore:
+    """In-memory task collection with incrementally maintained indexes
+    
+    - an id -> task hash index for O(1) lookups; ids must be unique
+    - the display order as a list kept sorted by insertion sequence, so a row
+      position is a bisect away and deletes are a single list memmove
+    - the counters of `stats` (TaskStats)
+    - the smart view ordering of pending tasks as a sorted list of
+      (-points, sequence, id) entries
+    - a word/trigram SearchIndex over the descriptions, plus a cache of
+      recent search results that any mutation invalidates. New tasks are
+      indexed by `index_some` (or by the next search), so loading a large
+      file does not pay for the index up front
+    
+    The sorted structures are plain lists maintained with bisect: lookups are
+    O(log n) and inserts/removals cost one memmove. Every mutation has to go
+    through the store so the indexes stay consistent; a task's index entries
+    are recomputed from its fields, so they are dropped before it changes.
+    
+    With NumPy installed the scoring fields of pending tasks are also kept in
+    ScoreColumns, so batches and day changes are scored vectorized.
+    """
+    
+    def __init__(self, tasks, today):
+        self.today = today
+        self.stats = TaskStats(today)
+        self._by_id = {}
+        self._seq = {}          # task id -> insertion sequence
+        self._rows = []         # tasks in display order
+        self._row_seqs = []     # insertion sequence of each row (sorted)
+        self._smart = []        # sorted smart view entries of pending tasks
+        self._counter = itertools.count()
+        self._columns = ScoreColumns() if numpy_module() is not None else None
+        self._search = SearchIndex()
+        self._unindexed = []    # tasks added since the last index_some
+        self._results = OrderedDict()   # search key -> matching tasks, most recent last
+        self.extend(tasks)
+    
+    def __len__(self):
+        return len(self._rows)
+    
+    def __getitem__(self, index):
+        return self._rows[index]
+    
+    def __iter__(self):
+        return iter(self._rows)
+    
+    def __contains__(self, task_id):
+        return task_id in self._by_id
+    
+    def get(self, task_id):
+        """Return the task with the given id, or None"""
+        return self._by_id.get(task_id)
+    
+    def add(self, task):
+        """Add a new task at the end of the list"""
+        self._append(task)
+        if not task.completed:
+            self._index_pending(task)
+    
+    def extend(self, tasks, smart=True):
+        """Add a batch of tasks at the end of the list
+        
+        The new smart view entries are sorted once and merged, which is much
+        cheaper than inserting them one at a time. With smart=False the smart
+        ordering is left stale until `sort_smart`, so a file loaded in many
+        batches is sorted once at the end instead of once per batch.
+        """
+        pending = []
+        columns = self._columns
+        for task in tasks:
+            self._append(task)
+            if not task.completed:
+                if columns is not None:
+                    pending.append(columns.set(task, self._seq[task.id]))
+                elif smart:
+                    pending.append(self._smart_entry(task))
+        if pending and smart:
+            if columns is not None:
+                entries = columns.entries(self.today, pending)
+            else:
+                entries = sorted(pending)
+            # Timsort merges the two sorted runs in linear time
+            self._smart += entries
+            self._smart.sort()
+    
+    def sort_smart(self):
+        """Rebuild the smart ordering after batches added with smart=False"""
+        self._rebuild_smart()
+    
+    def update(self, task_id, fields):
+        """Change attributes of a task and re-index it"""
+        self._update(self._by_id[task_id], fields)
+    
+    # Bulk changes touching more than 1/bulk_share of the list re-sort the
+    # smart ordering once instead of moving its entries one at a time
+    bulk_share = 8
+    
+    def update_many(self, task_ids, fields):
+        """Apply the same change to several tasks"""
+        smart = len(task_ids) * self.bulk_share <= len(self._rows)
+        for task_id in task_ids:
+            self._update(self._by_id[task_id], fields, smart)
+        if not smart:
+            self._rebuild_smart()
+    
+    def complete(self, task_id, completed_at):
+        """Mark a task as completed"""
+        task = self._by_id[task_id]
+        if not task.completed:
+            self.update(task_id, {"completed": True, "completed_at": completed_at})
+    
+    def complete_many(self, task_ids, completed_at):
+        """Mark several tasks as completed and return the ids that were pending"""
+        pending = [task_id for task_id in task_ids if not self._by_id[task_id].completed]
+        self.update_many(pending, {"completed": True, "completed_at": completed_at})
+        return pending
+    
+    def remove(self, task_id):
+        """Remove a task and return it"""
+        task = self._by_id[task_id]
+        self._unindex(task)
+        index = bisect.bisect_left(self._row_seqs, self._seq.pop(task_id))
+        del self._rows[index]
+        del self._row_seqs[index]
+        del self._by_id[task_id]
+        self._search.remove(task_id)
+        return task
+    
+    def remove_many(self, task_ids):
+        """Remove several tasks and return them
+        
+        Large batches filter the row list in a single pass.
+        """
+        if len(task_ids) * self.bulk_share <= len(self._rows):
+            return [self.remove(task_id) for task_id in task_ids]
+        removed = [self._by_id[task_id] for task_id in task_ids]
+        for task in removed:
+            self._unindex(task, smart=False)
+            del self._by_id[task.id]
+            del self._seq[task.id]
+            self._search.remove(task.id)
+        by_id = self._by_id
+        self._filter_rows(lambda task: by_id.get(task.id) is task)
+        self._rebuild_smart()
+        return removed
+    
+    def remove_completed(self):
+        """Remove all completed tasks and return their ids"""
+        removed = [task.id for task in self._rows if task.completed]
+        if removed:
+            self._filter_rows(lambda task: not task.completed)
+            for task_id in removed:
+                del self._by_id[task_id]
+                del self._seq[task_id]
+                self._search.remove(task_id)
+            self.stats.uncount_completed()
+            self._results.clear()
+        return removed
+    
+    def apply(self, op):
+        """Apply a journal record made elsewhere and return the ids of the tasks it touched
+        
+        Used to merge the changes of other instances sharing the task file.
+        Records are in their JSON form; a record for a task that is not here
+        is skipped, as is an add of a task already present.
+        """
+        kind = op.get("op")
+        if kind == "add":
+            task = Task.from_dict(op["task"])
+            if task.id in self._by_id:
+                return []
+            self.add(task)
+            return [task.id]
+        if kind == "clear_completed":
+            return self.remove_completed()
+        if kind == "batch":
+            return [task_id for sub in op["ops"] for task_id in self.apply(sub)]
+        if kind == "archive":
+            return [self.remove(task_id).id for task_id in op["ids"] if task_id in self._by_id]
+        task = self._by_id.get(op.get("id"))
+        if task is None:
+            return []
+        if kind == "delete":
+            self.remove(task.id)
+        else:
+            # Replay the record on the JSON form to get the new field values
+            data = {task.id: task.to_dict()}
+            apply_op(data, op)
+            self.replace(task.id, Task.from_dict(data[task.id]))
+        return [task.id]
+    
+    def replace(self, task_id, other):
+        """Give a task the fields of another Task object, if they differ"""
+        task = self._by_id[task_id]
+        fields = {name: getattr(other, name) for name in FIELDS}
+        if any(getattr(task, name) != value for name, value in fields.items()):
+            self.update(task_id, fields)
+    
+    def set_today(self, today):
+        """Re-score the smart ordering and the overdue count when the date changes"""
+        if today != self.today:
+            self.today = today
+            self.stats.set_today(today)
+            self._rebuild_smart()
+    
+    def smart_tasks(self):
+        """Iterate pending tasks in smart view order"""
+        by_id = self._by_id
+        return (by_id[entry[2]] for entry in self._smart)
+    
+    def smart_position(self, task_id):
+        """Return the smart view position of a pending task"""
+        return bisect.bisect_left(self._smart, self._smart_entry(self._by_id[task_id]))
+    
+    # Recent searches kept, and the largest result narrowed down in place when
+    # the user keeps typing instead of asking the index again
+    cache_size = 32
+    refine_limit = 5000
+    
+    def index_some(self, limit=None):
+        """Add up to `limit` new tasks to the search index
+        
+        Returns True while tasks are left to index.
+        """
+        backlog = self._unindexed
+        count = len(backlog) if limit is None else min(limit, len(backlog))
+        by_id = self._by_id
+        for task in backlog[:count]:
+            # Skip tasks removed before they were indexed
+            if by_id.get(task.id) is task:
+                self._search.add(task.id, task.description)
+        del backlog[:count]
+        return bool(backlog)
+    
+    def search(self, query="", priority=None, completed=None, due_from=None, due_to=None):
+        """Return the tasks matching a search, in display order
+        
+        Every whitespace separated term of `query` must occur in the
+        description (case insensitive). The other filters are optional: a
+        priority name, a completed flag and an inclusive range of due days;
+        tasks without a due date never match a due range.
+        """
+        terms = parse_query(query)
+        key = (terms, priority, completed, due_from, due_to)
+        results = self._results.get(key)
+        if results is not None:
+            self._results.move_to_end(key)
+            return results
+        
+        self.index_some()
+        narrowed = self._narrowable(key)
+        if narrowed is not None:
+            tasks = [task for task in narrowed if all(term in task.description.lower() for term in terms)]
+        else:
+            tasks = self._filter(self._candidates(terms), terms, priority, completed, due_from, due_to)
+        
+        self._results[key] = tasks
+        if len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+        return tasks
+    
+    def _narrowable(self, key):
+        # Typing more of the query only narrows the last results down
+        if not self._results:
+            return None
+        last_key, last = next(reversed(self._results.items()))
+        if last_key[1:] != key[1:] or len(last) > self.refine_limit:
+            return None
+        if not " ".join(key[0]).startswith(" ".join(last_key[0])):
+            return None
+        return last
+    
+    def _candidates(self, terms):
+        ids = self._search.match(terms)
+        if ids is None:
+            return self._rows
+        if len(ids) * 8 > len(self._rows):
+            # Large results: a pass over the rows is cheaper than sorting
+            return [task for task in self._rows if task.id in ids]
+        by_id = self._by_id
+        return [by_id[task_id] for task_id in sorted(ids, key=self._seq.__getitem__)]
+    
+    def _filter(self, tasks, terms, priority, completed, due_from, due_to):
+        # One pass per filter, cheapest first; each pass shrinks the next
+        if completed is not None:
+            tasks = [task for task in tasks if bool(task.completed) == completed]
+        if priority is not None:
+            tasks = [task for task in tasks if task.priority == priority]
+        if due_from is not None or due_to is not None:
+            low = due_from if due_from is not None else float("-inf")
+            high = due_to if due_to is not None else float("inf")
+            tasks = [task for task in tasks if task.due is not None and low <= task.due <= high]
+        for term in exact_terms(terms):
+            tasks = [task for task in tasks if term in task.description.lower()]
+        return tasks if tasks is not self._rows else list(tasks)
+    
+    def _append(self, task):
+        if task.id in self._by_id:
+            # Storage backends renumber duplicates on load
+            raise ValueError(f"Duplicate task id {task.id}")
+        seq = next(self._counter)
+        self._by_id[task.id] = task
+        self._seq[task.id] = seq
+        self._rows.append(task)
+        self._row_seqs.append(seq)
+        self._unindexed.append(task)
+        self._results.clear()
+        self.stats.count(task)
+    
+    def _smart_entry(self, task):
+        return (-smart_points(task, self.today), self._seq[task.id], task.id)
+    
+    def _update(self, task, fields, smart=True):
+        self._unindex(task, smart)
+        for name, value in fields.items():
+            setattr(task, name, value)
+        if "description" in fields:
+            self._search.add(task.id, task.description)
+        self.stats.count(task)
+        if not task.completed:
+            self._index_pending(task, smart)
+    
+    def _filter_rows(self, keep):
+        pairs = [(seq, task) for seq, task in zip(self._row_seqs, self._rows) if keep(task)]
+        self._row_seqs = [seq for seq, task in pairs]
+        self._rows = [task for seq, task in pairs]
+    
+    # With smart=False the smart ordering is left stale for a _rebuild_smart
+    def _index_pending(self, task, smart=True):
+        if smart:
+            bisect.insort(self._smart, self._smart_entry(task))
+        if self._columns is not None:
+            self._columns.set(task, self._seq[task.id])
+    
+    def _unindex(self, task, smart=True):
+        self._results.clear()
+        self.stats.uncount(task)
+        # Completed tasks are only counted, not indexed
+        if task.completed:
+            return
+        if smart:
+            del self._smart[bisect.bisect_left(self._smart, self._smart_entry(task))]
+        if self._columns is not None:
+            self._columns.discard(task.id)
+    
+    def _rebuild_smart(self):
+        if self._columns is not None:
+            self._smart = self._columns.entries(self.today)
+        else:
+            self._smart = sorted(self._smart_entry(task) for task in self._rows if not task.completed)
\ No newline at end of file
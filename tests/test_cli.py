@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+import config
+from storage import JournalStorage
+from task import format_day, today
+
+def run(capsys, *argv):
+    code = cli.main(list(argv))
+    return code, capsys.readouterr().out.splitlines()
+
+def listed(capsys, *argv, options=()):
+    code, lines = run(capsys, *options, "list", *argv)
+    assert code == 0
+    return [int(line.split()[0]) for line in lines if not line.startswith("Migrated")]
+
+@pytest.mark.parametrize("backend", ["journal", "sqlite"])
+def test_commands(tmp_path, monkeypatch, capsys, backend):
+    monkeypatch.chdir(tmp_path)
+    options = ["--backend", backend]
+    day = today()
+    for description, priority, due in [("later", "low", day + 3), ("overdue", "high", day - 1),
+                                       ("today", "medium", day), ("plain", "medium", None),
+                                       ("done", "high", None)]:
+        argv = ["add", description, "--priority", priority]
+        if due is not None:
+            argv += ["--due", format_day(due)]
+        code, lines = run(capsys, *options, *argv)
+        assert code == 0
+        assert lines[-1].startswith("Added task ")
+    ids = listed(capsys, options=options)
+    assert len(set(ids)) == 5
+    
+    code, lines = run(capsys, *options, "complete", str(ids[4]), str(ids[4]), "999999")
+    assert code == 1
+    assert lines == ["Completed 1 tasks", "Error: no task with id 999999"]
+    assert listed(capsys, "--pending", options=options) == ids[:4]
+    assert listed(capsys, "--offset", "1", "--limit", "2", options=options) == ids[1:3]
+    assert listed(capsys, "--smart", options=options) == [ids[1], ids[2], ids[3], ids[0]]
+    assert listed(capsys, "--smart", "--offset", "1", "--limit", "1", options=options) == [ids[2]]
+    
+    code, lines = run(capsys, *options, "stats")
+    assert code == 0
+    text = "\n".join(lines)
+    for label, value in [("Total", 5), ("Completed", 1), ("Pending", 4), ("Overdue", 1)]:
+        assert f"{label}: {value}" in text
+
+def test_bad_due_date(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    assert run(capsys, "add", "x", "--due", "tomorrow") == (1, ["Error: Invalid date format. Use YYYY-MM-DD"])
+    assert listed(capsys) == []
+
+def test_import(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cli, "IMPORT_CHUNK", 2)
+    (tmp_path / "tasks.csv").write_text("description,priority\na,high\n,low\nb,\nc,low\n")
+    assert run(capsys, "add", "first")[0] == 0
+    assert run(capsys, "import", "tasks.csv") == (0, ["Imported 3 tasks, skipped 1 rows without a description"])
+    code, lines = run(capsys, "list")
+    assert [line.split()[-1] for line in lines] == ["first", "a", "b", "c"]
+    assert len(set(listed(capsys))) == 4
+    
+    (tmp_path / "bad.ndjson").write_text('{"description": "d"}\n{"description": "e"}\n{"desc\n')
+    code, lines = run(capsys, "import", "bad.ndjson")
+    assert code == 1
+    assert lines[-1] == "Imported 2 tasks before the error"
+    assert len(listed(capsys)) == 6
+
+def test_journal_is_compacted(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "open_storage",
+                        lambda settings: JournalStorage(settings["data_file"], compact_every=3))
+    for number in range(3):
+        assert run(capsys, "add", f"task {number}")[0] == 0
+    assert not os.path.exists("tasks.json.journal")
+    assert os.path.exists("tasks.json")
+    assert run(capsys, "add", "task 3")[0] == 0
+    assert os.path.exists("tasks.json.journal")
+    assert len(set(listed(capsys))) == 4
+
+def test_startup_skips_tkinter_and_numpy():
+    code = "import sys, cli; print(sorted({'numpy', 'tkinter'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(cli.__file__),
+                            capture_output=True, text=True)
+    assert result.stdout == "[]\n", result.stderr
\ No newline at end of file
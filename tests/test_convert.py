@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from convert import main
+from engine import TaskEngine
+from storage import JournalStorage, snapshot_header
+from task import Task
+
+TODAY = 20000
+
+def write_tasks(path, count, compact):
+    storage = JournalStorage(str(path))
+    engine = TaskEngine(storage, TODAY)
+    engine.tasks.extend(map(Task.from_dict, storage.iter_load()), smart=False)
+    engine.loaded()
+    for number in range(count):
+        engine.add(f"task {number}")
+    engine.complete([task.id for task in list(engine.tasks)[::2]])
+    if compact:
+        assert storage.compact(engine.snapshot)
+    expected = [task.to_dict() for task in engine.tasks]
+    storage.close()
+    return expected
+
+def reload(path):
+    storage = JournalStorage(str(path))
+    try:
+        return [Task.from_dict(data).to_dict() for data in storage.iter_load()]
+    finally:
+        storage.close()
+
+@pytest.mark.parametrize("source", ["tasks.json", "./tasks.json"])
+def test_convert_in_place(tmp_path, monkeypatch, source):
+    monkeypatch.chdir(tmp_path)
+    write_tasks(tmp_path / "tasks.json", 5, compact=True)
+    expected = write_tasks(tmp_path / "tasks.json", 3, compact=False)
+    assert os.path.exists("tasks.json.journal")
+    
+    assert main([source, "tasks.json", "--format", "ndjson", "--compression", "gzip"]) == 0
+    # The journal is still there, and the new snapshot says it is covered
+    assert os.path.exists("tasks.json.journal")
+    assert snapshot_header("tasks.json")["seq"] > 0
+    assert reload(tmp_path / "tasks.json") == expected
+
+def test_convert_journal_only_file(tmp_path, capsys):
+    source = tmp_path / "tasks.json"
+    target = tmp_path / "converted.json"
+    expected = write_tasks(source, 4, compact=False)
+    assert not os.path.exists(source)
+    
+    assert main([str(source), str(target)]) == 0
+    assert "Wrote 4 tasks" in capsys.readouterr().out
+    assert snapshot_header(str(target))["seq"] == 0
+    assert reload(target) == expected
+    
+    # Ids of the source stay retired in the copy
+    storage = JournalStorage(str(target))
+    list(storage.iter_load())
+    assert storage.max_id >= max(task["id"] for task in expected)
+    storage.close()
+
+def test_convert_missing_file(tmp_path, capsys):
+    assert main([str(tmp_path / "missing.json"), str(tmp_path / "out.json")]) == 1
+    assert "does not exist" in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / "out.json")
\ No newline at end of file
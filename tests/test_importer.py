@@ -0,0 +1,53 @@
+import pytest
+
+from importer import ImportSource
+from task import Task
+
+def write(path, text):
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+def test_csv(tmp_path):
+    path = write(tmp_path / "tasks.csv",
+                 "\ufeffID, Description ,Priority,due_date,Completed\r\n"
+                 "7,Write report,HIGH,2024-10-01,yes\r\n"
+                 ",,low,,\r\n"
+                 "8, Call Bob ,,,0,extra cell\r\n"
+                 "9,\"Buy milk, eggs\",low,,x\r\n")
+    source = ImportSource(path)
+    tasks = list(source.iter_load())
+    assert tasks == [
+        {"description": "Write report", "priority": "high", "due_date": "2024-10-01", "completed": True},
+        {"description": "Call Bob", "completed": False},
+        {"description": "Buy milk, eggs", "priority": "low", "completed": True},
+    ]
+    assert source.skipped == 1
+    assert source.load_progress == 1.0
+    task = Task.from_dict(tasks[1])
+    assert (task.priority, task.due, task.completed) == ("medium", None, False)
+
+def test_csv_needs_a_description_column(tmp_path):
+    source = ImportSource(write(tmp_path / "tasks.csv", "title,priority\nWrite report,high\n"))
+    with pytest.raises(ValueError, match="description"):
+        list(source.iter_load())
+
+def test_ndjson(tmp_path):
+    path = write(tmp_path / "tasks.ndjson",
+                 '{"id": 3, "description": "Write report", "priority": "high", "completed": false}\n'
+                 '\n'
+                 '{"description": ""}\n'
+                 '{"description": "Plan", "due_date": "2024-10-01", "tags": ["work"]}\n')
+    source = ImportSource(path)
+    assert list(source.iter_load()) == [
+        {"description": "Write report", "priority": "high", "completed": False},
+        {"description": "Plan", "due_date": "2024-10-01", "tags": ["work"]},
+    ]
+    assert source.skipped == 1
+
+@pytest.mark.parametrize("line", ['{"description": "cut', '["description"]'])
+def test_ndjson_errors_name_the_line(tmp_path, line):
+    source = ImportSource(write(tmp_path / "tasks.jsonl", '{"description": "ok"}\n' + line + "\n"))
+    tasks = source.iter_load()
+    assert next(tasks) == {"description": "ok"}
+    with pytest.raises(ValueError, match="line 2"):
+        next(tasks)
\ No newline at end of file
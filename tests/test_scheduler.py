@@ -0,0 +1,63 @@
+from scheduler import RefreshScheduler
+
+class FakeRoot:
+    """Runs after_idle callbacks when the test calls idle()"""
+    
+    def __init__(self):
+        self.callbacks = {}
+        self.count = 0
+    
+    def after_idle(self, callback):
+        self.count += 1
+        self.callbacks[self.count] = callback
+        return self.count
+    
+    def after_cancel(self, handle):
+        self.callbacks.pop(handle, None)
+    
+    def idle(self):
+        callbacks, self.callbacks = self.callbacks, {}
+        for callback in callbacks.values():
+            callback()
+
+def open_scheduler(names, before_flush=None):
+    root = FakeRoot()
+    scheduler = RefreshScheduler(root, before_flush)
+    calls = []
+    for name in names:
+        scheduler.register(name, lambda keys, name=name: calls.append((name, keys)))
+    return root, scheduler, calls
+
+def test_marks_are_coalesced():
+    root, scheduler, calls = open_scheduler(["list", "smart", "stats"])
+    scheduler.mark("smart", 1)
+    scheduler.mark("list", 2)
+    scheduler.mark("smart", 3)
+    scheduler.mark("list")
+    scheduler.mark("list", 4)
+    assert len(root.callbacks) == 1
+    assert calls == []
+    
+    root.idle()
+    assert calls == [("list", None), ("smart", {1, 3})]
+    root.idle()
+    assert len(calls) == 2
+
+def test_flush_now_cancels_the_idle_flush():
+    root, scheduler, calls = open_scheduler(["list", "stats"])
+    scheduler.mark("stats")
+    scheduler.flush()
+    assert calls == [("stats", None)]
+    assert root.callbacks == {}
+    
+    scheduler.mark("list", 5)
+    root.idle()
+    assert calls == [("stats", None), ("list", {5})]
+
+def test_before_flush_can_mark_views():
+    root, scheduler, calls = open_scheduler(["list", "stats"], lambda: scheduler.mark("stats"))
+    scheduler.mark("list", 1)
+    root.idle()
+    assert calls == [("list", {1}), ("stats", None)]
+    # Marks made during the flush are refreshed in it, not scheduled again
+    assert root.callbacks == {}
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+
+from engine import TaskEngine
+from storage import JournalStorage
+from task import Task
+
+TODAY = 20000
+
+def open_engine(path):
+    storage = JournalStorage(str(path))
+    engine = TaskEngine(storage, TODAY)
+    engine.tasks.extend(map(Task.from_dict, storage.iter_load()), smart=False)
+    engine.loaded()
+    return engine
+
+def merge(engine):
+    """Apply the records of other instances, as the app's watch_file does"""
+    changes = engine.storage.poll_changes()
+    if changes is not None:
+        records, reload = changes
+        assert not reload
+        for record in records:
+            engine.tasks.apply(record)
+
+def on_file(path):
+    storage = JournalStorage(str(path))
+    try:
+        return [(data["description"], data["completed"]) for data in storage.iter_load()]
+    finally:
+        storage.close()
+
+def shown(engine):
+    return [(task.description, task.completed) for task in engine.tasks]
+
+def contents(tasks):
+    """Return tasks in a form that does not depend on the order each instance added them"""
+    return sorted((task.to_dict() for task in tasks), key=lambda data: data["id"])
+
+def test_changes_of_other_instances_are_merged(tmp_path):
+    path = tmp_path / "tasks.json"
+    first = open_engine(path)
+    second = open_engine(path)
+    task = first.add("from first")
+    second.add("from second")
+    merge(first)
+    merge(second)
+    first.complete([task.id])
+    second.update([task.id], {"priority": "high"})
+    merge(first)
+    merge(second)
+    
+    assert contents(first.tasks) == contents(second.tasks)
+    assert sorted(shown(first)) == sorted(on_file(path)) == [("from first", True), ("from second", False)]
+    assert {task.priority for task in second.tasks} == {"high", "medium"}
+    first.storage.close()
+    second.storage.close()
+
+def test_clear_merged_before_a_local_completion(tmp_path):
+    path = tmp_path / "tasks.json"
+    first = open_engine(path)
+    task = first.add("T")
+    done = first.add("U")
+    second = open_engine(path)
+    
+    # The first instance completes T, but its record is not written yet
+    completed_at = "2024-10-01 12:00:00"
+    first.tasks.complete(task.id, completed_at)
+    second.complete([done.id])
+    second.clear_completed()
+    first.storage.append([{"op": "complete", "id": task.id, "completed_at": completed_at}])
+    merge(first)
+    
+    assert shown(first) == on_file(path) == [("T", True)]
+    # Compacting from the merged tasks keeps the file as it is
+    assert first.storage.compact(first.snapshot)
+    first.storage.close()
+    second.storage.close()
+    assert on_file(path) == [("T", True)]
+def test_ids_stay_unique_after_a_missed_compaction(tmp_path):
+    path = tmp_path / "tasks.json"
+    first = open_engine(path)
+    first.add("from first")
+    second = open_engine(path)
+    used = {second.add(f"from second {number}").id for number in range(3)}
+    
+    # The first instance only looks at the file after the other compacted it
+    assert second.storage.compact(second.snapshot)
+    second.storage.close()
+    assert not os.path.exists(f"{path}.journal.old")
+    assert first.storage.reserve_ids(10) > max(used)
+    first.storage.close()
\ No newline at end of file
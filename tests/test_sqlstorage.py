@@ -0,0 +1,113 @@
+import random
+
+from archive import TaskArchive
+from engine import TaskEngine
+from scoring import smart_points
+from sqlstorage import SqliteStorage
+from storage import JournalStorage
+from task import Task, format_day
+
+TODAY = 20000
+
+def state(tasks):
+    return [(Task.from_dict(task) if isinstance(task, dict) else task).to_dict() for task in tasks]
+
+def open_engine(storage):
+    engine = TaskEngine(storage, TODAY)
+    engine.tasks.extend(map(Task.from_dict, storage.iter_load()), smart=False)
+    engine.loaded()
+    return engine
+
+def edit(engine, rng, steps):
+    for step in range(steps):
+        tasks = list(engine.tasks)
+        chosen = [task.id for task in rng.sample(tasks, min(len(tasks), rng.randint(1, 3)))]
+        action = rng.random()
+        if action < 0.5 or not tasks:
+            engine.add(f"task {rng.randint(1, 999)}", rng.choice(["high", "medium", "low"]),
+                       rng.choice([None, TODAY + rng.randint(-3, 3)]))
+        elif action < 0.7:
+            engine.complete(chosen)
+        elif action < 0.8:
+            engine.delete(chosen[:1])
+        elif action < 0.95:
+            engine.update(chosen, rng.choice([{"priority": "high"}, {"description": "edited"},
+                                              {"due": TODAY}, {"due": None}]))
+        else:
+            engine.clear_completed()
+
+def test_records_are_stored(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    rng = random.Random(1)
+    expected = []
+    for session in range(3):
+        storage = SqliteStorage(path)
+        engine = open_engine(storage)
+        assert state(engine.tasks) == expected
+        edit(engine, rng, 80)
+        expected = state(engine.tasks)
+        storage.close()
+    assert expected
+
+def test_queries_match_the_loaded_tasks(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "tasks.db"))
+    engine = open_engine(storage)
+    edit(engine, random.Random(2), 300)
+    tasks = list(engine.tasks)
+    day = format_day(TODAY)
+    
+    assert state(storage.page(0, 10)) == state(tasks[:10])
+    assert state(storage.page(25, -1)) == state(tasks[25:])
+    pending = [task for task in tasks if not task.completed]
+    assert 0 < len(pending) < len(tasks)
+    expected = sorted(pending, key=lambda task: -smart_points(task, TODAY))
+    assert [data["id"] for data in storage.smart_tasks(day)] == [task.id for task in expected]
+    assert [data["id"] for data in storage.smart_tasks(day, 5)] == [task.id for task in expected[:5]]
+    assert storage.stats(day) == {
+        "total": len(tasks),
+        "completed": len(tasks) - len(pending),
+        "pending": len(pending),
+        "overdue": sum(1 for task in pending if task.due is not None and task.due < TODAY),
+        "due_today": sum(1 for task in pending if task.due == TODAY),
+    }
+    storage.close()
+
+def test_migration(tmp_path):
+    source = str(tmp_path / "tasks.json")
+    archive_path = str(tmp_path / "tasks.archive")
+    engine = open_engine(JournalStorage(source, archive=TaskArchive(archive_path), compact_every=20))
+    edit(engine, random.Random(3), 100)
+    archived = engine.archive_completed()
+    edit(engine, random.Random(4), 20)
+    expected = state(engine.tasks) + state(archived)
+    last = engine.add("deleted").id
+    engine.delete([last])
+    engine.storage.close()
+    assert archived
+    
+    path = str(tmp_path / "tasks.db")
+    storage = SqliteStorage(path, migrate_from=source, migrate_archive=TaskArchive(archive_path))
+    assert state(storage.iter_load()) == expected
+    storage.close()
+    
+    # Only the first start copies the tasks
+    storage = SqliteStorage(path, migrate_from=source, migrate_archive=TaskArchive(archive_path))
+    assert storage.migrate() is None
+    assert state(storage.iter_load()) == expected
+    assert storage.reserve_ids(5) > last
+    storage.close()
+
+def test_migration_count(tmp_path):
+    source = str(tmp_path / "tasks.json")
+    engine = open_engine(JournalStorage(source))
+    for number in range(4):
+        engine.add(f"task {number}")
+    engine.storage.close()
+    
+    storage = SqliteStorage(str(tmp_path / "tasks.db"), migrate_from=source)
+    assert storage.migrate() == 4
+    storage.close()
+    storage = SqliteStorage(str(tmp_path / "empty.db"), migrate_from=str(tmp_path / "missing.json"))
+    assert storage.migrate() is None
+    assert list(storage.iter_load()) == []
+    storage.close()
\ No newline at end of file
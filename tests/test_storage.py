@@ -0,0 +1,188 @@
+import os
+import random
+
+import pytest
+
+from archive import TaskArchive
+from engine import TaskEngine
+from storage import JournalStorage, snapshot_header
+from task import Task
+
+TODAY = 20000
+FORMATS = [("json", "none"), ("json", "gzip"), ("ndjson", "none"), ("ndjson", "gzip")]
+
+def state(tasks):
+    """Return tasks (dicts as read from a file, or Task objects) in one comparable form"""
+    return [(Task.from_dict(task) if isinstance(task, dict) else task).to_dict() for task in tasks]
+
+def open_engine(path, archive=None, **options):
+    """Load a task file into a TaskEngine the way the app does"""
+    storage = JournalStorage(str(path), archive=archive, **options)
+    engine = TaskEngine(storage, TODAY)
+    engine.tasks.extend(map(Task.from_dict, storage.iter_load()), smart=False)
+    engine.loaded()
+    return engine
+
+def reload(path, archive_path=None):
+    archive = TaskArchive(str(archive_path)) if archive_path else None
+    storage = JournalStorage(str(path), archive=archive)
+    try:
+        return state(storage.iter_load())
+    finally:
+        storage.close()
+
+def edit(engine, rng, steps, archived=None):
+    """Make random changes through the engine; return the ids it handed out"""
+    used = set()
+    for step in range(steps):
+        tasks = list(engine.tasks)
+        chosen = [task.id for task in rng.sample(tasks, min(len(tasks), rng.randint(1, 3)))]
+        action = rng.random()
+        if action < 0.45 or not tasks:
+            task = engine.add(f"task {rng.randint(1, 999)}", rng.choice(["high", "medium", "low"]),
+                              rng.choice([None, TODAY + rng.randint(-3, 3)]))
+            used.add(task.id)
+        elif action < 0.65:
+            engine.complete(chosen)
+        elif action < 0.75:
+            engine.delete(chosen[:1])
+        elif action < 0.95:
+            engine.update(chosen, rng.choice([{"priority": "high"}, {"description": "edited"}, {"due": None}]))
+        elif archived is not None:
+            archived += engine.archive_completed()
+        else:
+            engine.clear_completed()
+    return used
+
+@pytest.mark.parametrize("format,compression", FORMATS)
+def test_replay_across_compactions(tmp_path, format, compression):
+    path = tmp_path / "tasks.json"
+    rng = random.Random(format + compression)
+    used = set()
+    for session in range(3):
+        engine = open_engine(path, compact_every=7, format=format, compression=compression)
+        assert state(engine.tasks) == (expected if session else [])
+        used |= edit(engine, rng, 80)
+        expected = state(engine.tasks)
+        engine.storage.close()
+        assert expected
+        assert reload(path) == expected
+    assert snapshot_header(str(path))["seq"] > 0
+    
+    # Ids of deleted tasks are not handed out again
+    engine = open_engine(path)
+    assert engine.allocate_ids() > max(used)
+    engine.storage.close()
+
+def test_any_format_is_read(tmp_path):
+    path = tmp_path / "tasks.json"
+    rng = random.Random(1)
+    expected = []
+    for format, compression in FORMATS + FORMATS[::-1]:
+        engine = open_engine(path, compact_every=5, format=format, compression=compression)
+        assert state(engine.tasks) == expected
+        edit(engine, rng, 20)
+        expected = state(engine.tasks)
+        engine.storage.close()
+    assert expected
+
+def test_deleted_ids_stay_taken_after_compaction(tmp_path):
+    path = tmp_path / "tasks.json"
+    engine = open_engine(path)
+    last = max(engine.add(f"task {number}").id for number in range(3))
+    engine.delete([last])
+    assert engine.storage.compact(engine.snapshot)
+    engine.storage.close()
+    assert not os.path.exists(f"{path}.journal")
+    
+    # Only the snapshot header remembers the id now
+    engine = open_engine(path)
+    assert engine.allocate_ids() > last
+    engine.storage.close()
+
+def test_torn_journal_line_is_dropped(tmp_path):
+    path = tmp_path / "tasks.json"
+    engine = open_engine(path)
+    edit(engine, random.Random(2), 30)
+    expected = state(engine.tasks)
+    engine.storage.close()
+    with open(f"{path}.journal", "ab") as f:
+        f.write(b'{"op":"add","task":{"id":999,"desc')
+    
+    assert reload(path) == expected
+    with open(f"{path}.journal", "rb") as f:
+        assert f.read().endswith(b"\n")
+
+def test_compact_file_streams_the_snapshot(tmp_path):
+    path = tmp_path / "tasks.json"
+    engine = open_engine(path, compact_every=1000, format="ndjson", compression="gzip")
+    edit(engine, random.Random(3), 100)
+    expected = state(engine.tasks)
+    engine.storage.close()
+    assert expected
+    
+    storage = JournalStorage(str(path), compact_every=1)
+    assert storage.read_tail()
+    assert storage.pending_ops > 0
+    assert storage.compact_file()
+    storage.close()
+    assert not os.path.exists(f"{path}.journal")
+    assert reload(path) == expected
+
+def test_archive(tmp_path):
+    path = tmp_path / "tasks.json"
+    archive_path = tmp_path / "tasks.archive"
+    rng = random.Random(4)
+    archived = []
+    for session in range(3):
+        engine = open_engine(path, TaskArchive(str(archive_path)), compact_every=9)
+        edit(engine, rng, 60, archived)
+        archived += engine.archive_completed()
+        expected = state(engine.tasks)
+        engine.storage.close()
+        assert reload(path, archive_path) == expected
+    
+    assert archived and expected
+    archive = TaskArchive(str(archive_path))
+    assert state(archive[index] for index in range(len(archive))) == state(archived)
+    assert all(task.completed for task in archived)
+    assert not {task["id"] for task in expected} & {task.id for task in archived}
+    archive.close()
+
+def test_archived_batch_without_journal_record(tmp_path):
+    path = tmp_path / "tasks.json"
+    archive_path = tmp_path / "tasks.archive"
+    engine = open_engine(path, TaskArchive(str(archive_path)))
+    edit(engine, random.Random(5), 40)
+    engine.complete([task.id for task in list(engine.tasks)[:5]])
+    tasks = [task for task in engine.tasks if task.completed]
+    expected = state(task for task in engine.tasks if not task.completed)
+    engine.storage.close()
+    
+    # A crash after the archive was written but before the journal record
+    archive = TaskArchive(str(archive_path))
+    archive.append(tasks)
+    archive.close()
+    assert reload(path, archive_path) == expected
+
+def test_snapshot_written_after_later_changes(tmp_path):
+    path = tmp_path / "tasks.json"
+    engine = open_engine(path)
+    keep = engine.add("keep me")
+    engine.add("other")
+    engine.add("third")
+    
+    # Hold the snapshot write back until the tasks have changed again
+    storage = engine.storage
+    held = []
+    storage._write_snapshot = lambda *args: held.append(args)
+    assert storage.compact(engine.snapshot)
+    del storage._write_snapshot
+    engine.clear_completed()
+    engine.complete([keep.id])
+    storage._write_snapshot(*held[0])
+    expected = state(engine.tasks)
+    storage.close()
+    
+    assert [task["description"] for task in expected] == ["keep me", "other", "third"]
+    assert reload(path) == expected
\ No newline at end of file
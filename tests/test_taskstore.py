@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from scoring import smart_points
+from task import Task
+from taskstore import TaskStore
+
+TODAY = 20000
+WORDS = ["report", "email", "groceries", "call", "review", "a", "ab", "v1.2", "Plan"]
+
+def make_task(rng, task_id):
+    return Task(task_id, f"{rng.choice(WORDS)} {rng.choice(WORDS)} {task_id}",
+                rng.choice(["high", "medium", "low"]),
+                rng.choice([None, TODAY + rng.randint(-3, 3)]),
+                (TODAY + rng.randint(-1, 0)) * 86400 + 43200)
+
+def check(store, model):
+    """Compare the store's indexes with values computed from `model`"""
+    assert [task.id for task in store] == [task.id for task in model]
+    
+    pending = [task for task in model if not task.completed]
+    # sorted() is stable, so ties keep the insertion order like the store
+    expected = sorted(pending, key=lambda task: -smart_points(task, store.today))
+    assert [task.id for task in store.smart_tasks()] == [task.id for task in expected]
+    for position, task in enumerate(expected):
+        assert store.smart_position(task.id) == position
+    
+    stats = store.stats
+    assert stats.total == len(model)
+    assert stats.completed == sum(1 for task in model if task.completed)
+    assert stats.pending == len(pending)
+    assert stats.overdue == sum(1 for task in pending if task.due is not None and task.due < store.today)
+    assert stats.due_today == sum(1 for task in pending if task.due == store.today)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_indexes_match_brute_force(seed):
+    rng = random.Random(seed)
+    model = [make_task(rng, task_id) for task_id in range(1, 51)]
+    store = TaskStore(model, TODAY)
+    model = list(model)
+    next_id = 51
+    check(store, model)
+    
+    for step in range(150):
+        action = rng.random()
+        # Small and large selections take different paths in the store
+        count = rng.choice([1, 3, len(model) // 2 + 1])
+        chosen = rng.sample(model, min(count, len(model)))
+        ids = [task.id for task in chosen]
+        if action < 0.2 or not model:
+            batch = [make_task(rng, task_id) for task_id in range(next_id, next_id + rng.randint(1, 20))]
+            next_id += len(batch)
+            if len(batch) == 1:
+                store.add(batch[0])
+            else:
+                smart = rng.random() < 0.5
+                store.extend(batch, smart=smart)
+                if not smart:
+                    store.sort_smart()
+            model += batch
+        elif action < 0.4:
+            fields = rng.choice([{"priority": rng.choice(["high", "medium", "low"])},
+                                 {"due": rng.choice([None, TODAY + rng.randint(-3, 3)])},
+                                 {"description": rng.choice(WORDS)}])
+            # The store changes the model's task objects themselves
+            store.update_many(ids, fields)
+        elif action < 0.6:
+            pending = [task.id for task in chosen if not task.completed]
+            assert store.complete_many(ids, "2024-10-01 12:00:00") == pending
+        elif action < 0.8:
+            store.remove_many(ids)
+            model = [task for task in model if task.id not in ids]
+        elif action < 0.9:
+            removed = store.remove_completed()
+            assert removed == [task.id for task in model if task.completed]
+            model = [task for task in model if not task.completed]
+        else:
+            store.set_today(TODAY + rng.randint(-2, 2))
+        check(store, model)
+
+def test_search_matches_brute_force():
+    rng = random.Random(7)
+    model = [make_task(rng, task_id) for task_id in range(1, 301)]
+    store = TaskStore(model, TODAY)
+    store.remove_many([task.id for task in model[::5]])
+    model = [task for task in model if task.id in store]
+    store.update_many([task.id for task in model[:20]], {"description": "renamed v1.2 Plan"})
+    
+    for query in ["", "a", "ab", "re", "rep", "REPORT email", "v1.2", "1.2", "plan 3", "zzz"]:
+        terms = query.lower().split()
+        expected = [task.id for task in model if all(term in task.description.lower() for term in terms)]
+        assert [task.id for task in store.search(query)] == expected, query
+        expected = [task.id for task in model
+                    if task.priority == "high" and all(term in task.description.lower() for term in terms)]
+        assert [task.id for task in store.search(query, priority="high")] == expected, query
\ No newline at end of file
@@ -0,0 +1,220 @@
+import random
+
+import pytest
+
+from task import Task
+from viewmodel import TreeViewModel, VirtualTreeViewModel
+
+TODAY = 20000
+
+class FakeTree:
+    """The part of ttk.Treeview the view models use, without a display"""
+    
+    def __init__(self):
+        self.children = []
+        self.rows = {}
+        self.calls = {"insert": 0, "item": 0, "delete": 0, "move": 0}
+        self.count = 0
+        self.selected = ()
+        self.focused = ""
+        self.bindings = {}
+    
+    def insert(self, parent, index, values=()):
+        self.calls["insert"] += 1
+        self.count += 1
+        item = f"I{self.count:03}"
+        self.rows[item] = values
+        self.children.insert(len(self.children) if index == "end" else index, item)
+        return item
+    
+    def item(self, item, values=()):
+        self.calls["item"] += 1
+        self.rows[item] = values
+    
+    def delete(self, *items):
+        self.calls["delete"] += 1
+        for item in items:
+            del self.rows[item]
+        self.detach(*items)
+    
+    def detach(self, *items):
+        self.children = [child for child in self.children if child not in items]
+    
+    def move(self, item, parent, index):
+        self.calls["move"] += 1
+        self.detach(item)
+        self.children.insert(index, item)
+    
+    def get_children(self):
+        return tuple(self.children)
+    
+    def bind(self, sequence, command):
+        self.bindings[sequence] = command
+    
+    def selection(self):
+        return self.selected
+    
+    def selection_set(self, items):
+        self.selected = tuple(items)
+    
+    def focus(self, item=None):
+        if item is None:
+            return self.focused
+        self.focused = item
+    
+    def yview_moveto(self, fraction):
+        pass
+
+class FakeScrollbar:
+    def configure(self, command):
+        self.command = command
+    
+    def set(self, first, last):
+        self.position = (first, last)
+
+def render(task):
+    return (task.description, task.priority)
+
+def shown(tree):
+    return [tree.rows[item] for item in tree.get_children()]
+
+def make_tasks(count):
+    return [Task(task_id, f"task {task_id}", "medium", None, TODAY * 86400) for task_id in range(1, count + 1)]
+
+def test_sync_shows_the_tasks_in_order():
+    rng = random.Random(1)
+    tree = FakeTree()
+    view = TreeViewModel(tree, render)
+    tasks = make_tasks(40)
+    pool = list(tasks)
+    shown_tasks = []
+    for step in range(100):
+        action = rng.random()
+        if action < 0.4:
+            shown_tasks = rng.sample(pool, rng.randint(0, len(pool)))
+        elif action < 0.7:
+            task = rng.choice(pool)
+            task.priority = rng.choice(["high", "medium", "low"])
+        else:
+            shown_tasks = [task for task in shown_tasks if rng.random() < 0.8]
+        view.sync(shown_tasks)
+        assert shown(tree) == [render(task) for task in shown_tasks]
+        assert [view.ids[item] for item in tree.get_children()] == [task.id for task in shown_tasks]
+        assert len(tree.rows) == len(shown_tasks)
+
+def test_sync_only_touches_rows_that_changed():
+    tree = FakeTree()
+    view = TreeViewModel(tree, render)
+    tasks = make_tasks(10)
+    view.sync(tasks)
+    tree.calls = dict.fromkeys(tree.calls, 0)
+    
+    tasks[3].priority = "high"
+    del tasks[5]
+    tasks.insert(2, Task(11, "new", "low", None, TODAY * 86400))
+    view.sync(tasks)
+    assert tree.calls == {"insert": 1, "item": 1, "delete": 1, "move": 0}
+    assert shown(tree) == [render(task) for task in tasks]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_place_many_reaches_the_target_order(seed):
+    rng = random.Random(seed)
+    tree = FakeTree()
+    view = TreeViewModel(tree, render)
+    tasks = make_tasks(30)
+    next_id = 31
+    order = rng.sample(tasks, 20)
+    view.sync(order)
+    
+    for step in range(20):
+        # Rows that are not placed again must keep their relative order
+        removed = rng.sample(order, rng.randint(0, 3))
+        moved = rng.sample([task for task in order if task not in removed], rng.randint(0, 5))
+        added = make_tasks(next_id + rng.randint(0, 3))[next_id - 1:]
+        next_id += len(added)
+        target = [task for task in order if task not in removed and task not in moved]
+        for task in moved + added:
+            target.insert(rng.randint(0, len(target)), task)
+        
+        view.delete(*[task.id for task in removed])
+        view.place_many([(target.index(task), task) for task in moved + added])
+        order = target
+        assert [view.ids[item] for item in tree.get_children()] == [task.id for task in order]
+        assert shown(tree) == [render(task) for task in order]
+        assert len(tree.rows) == len(order)
+
+def test_place_moves_one_row():
+    tree = FakeTree()
+    view = TreeViewModel(tree, render)
+    tasks = make_tasks(5)
+    view.sync(tasks)
+    
+    tasks[4].priority = "high"
+    view.place(tasks[4], 0)
+    view.place(Task(6, "new", "low", None, TODAY * 86400), 2)
+    assert [view.ids[item] for item in tree.get_children()] == [5, 1, 6, 2, 3, 4]
+    assert tree.rows[tree.get_children()[0]] == ("task 5", "high")
+class Event:
+    def __init__(self, state=0):
+        self.state = state
+
+def open_virtual(tasks, visible=10):
+    tree = FakeTree()
+    view = VirtualTreeViewModel(tree, FakeScrollbar(), render, lambda: tasks)
+    view.visible = visible
+    view.refresh()
+    return tree, view
+
+def test_virtual_view_reuses_its_rows():
+    tasks = make_tasks(1000)
+    tree, view = open_virtual(tasks)
+    rows = view.visible + view.overscan
+    assert shown(tree) == [render(task) for task in tasks[:rows]]
+    
+    view.scroll(500)
+    view.yview("scroll", 3, "pages")
+    assert view.first == 530
+    assert shown(tree) == [render(task) for task in tasks[530:530 + rows]]
+    view.yview("moveto", "0.995")
+    assert shown(tree) == [render(task) for task in tasks[-view.visible:]]
+    assert view.scrollbar.position == (0.99, 1.0)
+    assert tree.calls["insert"] == rows
+    
+    # Rows out of the window are not rendered
+    tasks[0].priority = "high"
+    view.update(tasks[0])
+    tasks[-1].priority = "high"
+    view.update(tasks[-1])
+    assert tree.rows[tree.get_children()[-1]] == ("task 1000", "high")
+    assert ("task 1", "high") not in shown(tree)
+    
+    del tasks[5:]
+    view.refresh()
+    assert shown(tree) == [render(task) for task in tasks]
+
+def test_virtual_view_keeps_the_selection_out_of_view():
+    tasks = make_tasks(100)
+    tree, view = open_virtual(tasks)
+    tree.selection_set(tree.get_children()[2:4])
+    view.on_click(Event())
+    view.on_select(Event())
+    assert view.selection() == [3, 4]
+    
+    view.scroll(50)
+    assert tree.selection() == ()
+    tree.selection_set(tree.get_children()[:1])
+    view.on_click(Event(state=0x0004))
+    view.on_select(Event())
+    assert view.selection() == [3, 4, 51]
+    
+    view.scroll(-50)
+    assert [view.task_id(item) for item in tree.selection()] == [3, 4]
+    view.forget(3)
+    view.step(1)
+    assert view.selection() == [2]
+    assert tree.selection() == (tree.get_children()[1],)
+    
+    view.select_all()
+    assert view.selection() == [task.id for task in tasks]
+    view.clear_selection()
+    assert view.selection() == []
\ No newline at end of file
@@ -0,0 +1,315 @@
+from instrument import tracer
+
+class TreeViewModel:
+    """Keeps a Treeview in step with a list of tasks using minimal row operations
+    
+    Rows are tracked by task id, so a single mutation only touches the affected
+    row instead of clearing and re-inserting the whole list.
+    """
+    
+    def __init__(self, tree, render, key=lambda task: task.id):
+        self.tree = tree
+        self.render = render
+        self.key = key
+        self.items = {}   # task id -> Treeview item id
+        self.ids = {}     # Treeview item id -> task id
+        self.values = {}  # task id -> rendered row values
+    
+    def insert(self, task, index="end"):
+        """Insert a row for a task"""
+        task_id = self.key(task)
+        values = self.render(task)
+        if index != "end" and index >= len(self.items):
+            index = "end"
+        item = self.tree.insert("", index, values=values)
+        tracer.count("rows inserted")
+        self.items[task_id] = item
+        self.ids[item] = task_id
+        self.values[task_id] = values
+        return item
+    
+    def update(self, task):
+        """Refresh a task's row if its values changed"""
+        task_id = self.key(task)
+        values = self.render(task)
+        if self.values.get(task_id) != values:
+            self.tree.item(self.items[task_id], values=values)
+            tracer.count("rows updated")
+            self.values[task_id] = values
+    
+    def delete(self, *task_ids):
+        """Remove the rows of the given tasks"""
+        items = []
+        for task_id in task_ids:
+            item = self.items.pop(task_id, None)
+            if item is not None:
+                del self.ids[item]
+                del self.values[task_id]
+                items.append(item)
+        if items:
+            self.tree.delete(*items)
+            tracer.count("rows deleted", len(items))
+    
+    def place(self, task, index):
+        """Insert a task's row at `index`, or move its existing row there"""
+        if self.key(task) in self.items:
+            self.update(task)
+            self.move(self.key(task), index)
+        else:
+            self.insert(task, index)
+    
+    def move(self, task_id, index):
+        """Move a task's row to `index` among the other rows"""
+        item = self.items[task_id]
+        # Detach first so `index` counts the remaining rows only
+        self.tree.detach(item)
+        self.tree.move(item, "", index)
+        tracer.count("rows moved")
+    
+    def place_many(self, placed):
+        """Put several tasks at their final indexes
+        
+        `placed` holds (index, task) pairs. All their existing rows are
+        detached first and the rows go back by ascending index, so each index
+        only counts rows that are already in their final place.
+        """
+        placed = sorted(placed, key=lambda entry: entry[0])
+        items = [self.items[self.key(task)] for index, task in placed if self.key(task) in self.items]
+        if items:
+            self.tree.detach(*items)
+        for index, task in placed:
+            if self.key(task) in self.items:
+                self.update(task)
+                self.tree.move(self.items[self.key(task)], "", index)
+                tracer.count("rows moved")
+            else:
+                self.insert(task, index)
+    
+    def _clear_rows(self):
+        if self.items:
+            self.tree.delete(*self.items.values())
+            tracer.count("rows deleted", len(self.items))
+        self.items.clear()
+        self.ids.clear()
+        self.values.clear()
+    
+    def sync(self, tasks):
+        """Show `tasks` in order, touching only rows that differ"""
+        tasks = list(tasks)
+        wanted = set(map(self.key, tasks))
+        self.delete(*[task_id for task_id in self.items if task_id not in wanted])
+        
+        # Existing rows keep their relative order when tasks are only added,
+        # edited or removed; anything else is cheaper to rebuild
+        existing = [self.key(task) for task in tasks if self.key(task) in self.items]
+        current = [self.ids[item] for item in self.tree.get_children()]
+        if existing != current:
+            self._clear_rows()
+        
+        for index, task in enumerate(tasks):
+            if self.key(task) in self.items:
+                self.update(task)
+            else:
+                self.insert(task, index)
+
+class VirtualTreeViewModel:
+    """Windowed view over a task sequence for very long lists
+    
+    Only the visible rows plus a small overscan exist as Treeview items. The
+    pooled items are relabelled as the view scrolls, so widget memory and redraw
+    cost stay constant however many tasks the sequence holds. The scrollbar is
+    driven from the sequence position rather than from the Treeview itself.
+    """
+    
+    overscan = 2
+    wheel_rows = 3
+    
+    def __init__(self, tree, scrollbar, render, source, key=lambda task: task.id):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.render = render
+        self.source = source  # callable returning the current task sequence
+        self.key = key
+        self.first = 0        # sequence index of the top row
+        self.visible = 20     # rows that fit in the widget
+        self.items = []       # pooled Treeview item ids, top to bottom
+        self.shown = []       # task ids in the pooled rows
+        self.values = []      # rendered values of the pooled rows
+        self.selected = {}    # selected task ids, in selection order
+        self.extend = False   # whether the last click kept the selection
+        
+        scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", self.on_resize)
+        tree.bind("<ButtonPress-1>", self.on_click)
+        tree.bind("<<TreeviewSelect>>", self.on_select)
+        tree.bind("<MouseWheel>", self.on_mousewheel)
+        tree.bind("<Button-4>", lambda event: self.scroll(-self.wheel_rows))
+        tree.bind("<Button-5>", lambda event: self.scroll(self.wheel_rows))
+        tree.bind("<Up>", lambda event: self.step(-1))
+        tree.bind("<Down>", lambda event: self.step(1))
+        tree.bind("<Prior>", lambda event: self.step(-self.visible))
+        tree.bind("<Next>", lambda event: self.step(self.visible))
+        tree.bind("<Control-a>", self.select_all)
+    
+    def task_id(self, item):
+        """Return the task id currently shown in a pooled item"""
+        if item in self.items:
+            return self.shown[self.items.index(item)]
+        return None
+    
+    def selection(self):
+        """Return the selected task ids, including rows scrolled out of view"""
+        return list(self.selected)
+    
+    def clear_selection(self):
+        """Deselect every task; the caller refreshes later"""
+        self.selected = {}
+    
+    def select_all(self, event=None):
+        """Select every task of the sequence"""
+        self.selected = dict.fromkeys(map(self.key, self.source()))
+        self.refresh()
+        return "break"
+    
+    def update(self, task):
+        """Refresh a task's row if it is in the visible window"""
+        task_id = self.key(task)
+        if task_id in self.shown:
+            pos = self.shown.index(task_id)
+            values = self.render(task)
+            if self.values[pos] != values:
+                self.tree.item(self.items[pos], values=values)
+                tracer.count("rows updated")
+                self.values[pos] = values
+    
+    def forget(self, *task_ids):
+        """Drop removed tasks from the selection; the caller refreshes later"""
+        for task_id in task_ids:
+            self.selected.pop(task_id, None)
+    
+    def refresh(self):
+        """Render the visible window of the sequence into the pooled rows"""
+        tasks = self.source()
+        total = len(tasks)
+        self.first = max(0, min(self.first, total - self.visible))
+        count = min(self.visible + self.overscan, total - self.first)
+        
+        if len(self.items) > count:
+            self.tree.delete(*self.items[count:])
+            tracer.count("rows deleted", len(self.items) - count)
+            del self.items[count:], self.shown[count:], self.values[count:]
+        for pos in range(count):
+            task = tasks[self.first + pos]
+            values = self.render(task)
+            if pos == len(self.items):
+                self.items.append(self.tree.insert("", "end", values=values))
+                tracer.count("rows inserted")
+                self.shown.append(self.key(task))
+                self.values.append(values)
+            else:
+                if self.values[pos] != values:
+                    self.tree.item(self.items[pos], values=values)
+                    tracer.count("rows updated")
+                    self.values[pos] = values
+                self.shown[pos] = self.key(task)
+        
+        # Carry the selection over to whichever pooled rows now show the tasks;
+        # the <<TreeviewSelect>> this causes must not drop hidden ones
+        self.extend = True
+        selected = [item for item, task_id in zip(self.items, self.shown) if task_id in self.selected]
+        if set(selected) != set(self.tree.selection()):
+            self.tree.selection_set(selected)
+        self.tree.yview_moveto(0)
+        
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def yview(self, *args):
+        """Scrollbar command: move the window instead of the Treeview"""
+        total = len(self.source())
+        if not args or not total:
+            return
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            count = int(args[1])
+            if args[2] == "pages":
+                count *= self.visible
+            self.first += count
+        self.refresh()
+    
+    def scroll(self, rows):
+        """Scroll the window by a number of rows"""
+        self.first += rows
+        self.refresh()
+        return "break"
+    
+    def see(self, index):
+        """Scroll so that the task at `index` is visible"""
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self.visible:
+            self.first = index - self.visible + 1
+        self.refresh()
+    
+    def on_mousewheel(self, event):
+        """Scroll on mouse wheel (Windows and macOS deltas)"""
+        if abs(event.delta) >= 120:
+            rows = -(event.delta // 120) * self.wheel_rows
+        else:
+            rows = -event.delta
+        return self.scroll(rows)
+    
+    def step(self, delta):
+        """Move the keyboard selection, scrolling the window at its edges"""
+        total = len(self.source())
+        if not total:
+            return "break"
+        focus = self.tree.focus()
+        if focus in self.items:
+            index = self.first + self.items.index(focus)
+        else:
+            index = self.first
+        index = max(0, min(total - 1, index + delta))
+        self.see(index)
+        pos = index - self.first
+        self.selected = {self.shown[pos]: None}
+        self.tree.selection_set([self.items[pos]])
+        self.tree.focus(self.items[pos])
+        return "break"
+    
+    def on_resize(self, event):
+        """Recompute how many rows fit after the widget is resized"""
+        row_height = 20
+        header = row_height
+        if self.items:
+            bbox = self.tree.bbox(self.items[0])
+            if bbox:
+                header, row_height = bbox[1], bbox[3]
+        self.visible = max(1, (event.height - header) // max(1, row_height))
+        self.refresh()
+    
+    # Shift, Control and Command (Mod1 on macOS) clicks extend the selection
+    EXTEND_STATE = 0x0001 | 0x0004 | 0x0008
+    
+    def on_click(self, event):
+        """Note whether a click replaces the selection or extends it"""
+        self.extend = bool(event.state & self.EXTEND_STATE)
+    
+    def on_select(self, event):
+        """Take over the Treeview selection of the visible rows
+        
+        After a plain click only the clicked rows stay selected; otherwise
+        selected tasks scrolled out of view are kept.
+        """
+        picked = [self.task_id(item) for item in self.tree.selection() if item in self.items]
+        if not self.extend:
+            self.selected = dict.fromkeys(picked)
+            return
+        shown = set(self.shown)
+        self.selected = {task_id: None for task_id in self.selected
+                         if task_id not in shown or task_id in picked}
+        for task_id in picked:
+            self.selected.setdefault(task_id)
\ No newline at end of file